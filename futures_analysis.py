@@ -1,39 +1,385 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.backend_bases import key_press_handler
-from matplotlib import rcParams
 import platform
 from datetime import datetime, timedelta
 import threading
+import time
 import re
 import os
 import sys
-import requests
-from lxml import etree
-
-# ========== 中文显示配置 ==========
-if platform.system() == 'Windows':
-    rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
-    rcParams['axes.unicode_minus'] = False
-elif platform.system() == 'Darwin':
-    rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Heiti TC']
-    rcParams['axes.unicode_minus'] = False
-else:
-    rcParams['font.sans-serif'] = ['DejaVu Sans']
-    rcParams['axes.unicode_minus'] = False
+import gzip
+import json
+import bisect
+import math
+import argparse
+import importlib
+import shutil
+import subprocess
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+# ========== 重型依赖（首次使用时导入，缩短启动时间） ==========
+# 各模块的导入耗时（秒），按实际导入顺序记录，已被先导入的模块带入的依赖不再计入
+IMPORT_TIMINGS = {}
+
+def timed_import(name):
+    """导入模块并记录耗时"""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMINGS.setdefault(name, time.perf_counter() - start)
+    return module
+
+class _LazyModule:
+    """模块代理：首次访问属性时才导入，导入后用真实模块替换本模块中的全局名称，之后访问没有额外开销"""
+    
+    def __init__(self, name, alias):
+        self.__dict__["_name"] = name
+        self.__dict__["_alias"] = alias
+        self.__dict__["_module"] = None
+    
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = timed_import(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+            globals()[self.__dict__["_alias"]] = module
+        return module
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+    
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+    
+    def __dir__(self):
+        return dir(self._load())
+    
+    def __repr__(self):
+        state = "已导入" if self.__dict__["_module"] is not None else "未导入"
+        return f"<延迟导入模块 {self.__dict__['_name']} ({state})>"
+
+np = _LazyModule("numpy", "np")
+pd = _LazyModule("pandas", "pd")
+requests = _LazyModule("requests", "requests")
+etree = _LazyModule("lxml.etree", "etree")
+LAZY_MODULES = [np, pd, requests, etree]
+
+def preload_modules(extra=()):
+    """依次导入所有延迟导入的模块（图形界面启动后在后台线程中调用），extra为额外需要预先导入的模块名"""
+    for module in LAZY_MODULES:
+        module._load()
+    for name in extra:
+        timed_import(name)
+
+# ========== 界面依赖（延迟导入，命令行模式不加载Tk和matplotlib） ==========
+tk = ttk = messagebox = filedialog = None
+plt = mdates = FigureCanvasTkAgg = NavigationToolbar2Tk = key_press_handler = None
+
+def load_tk_modules():
+    """只导入Tk（很快），使窗口可以在matplotlib加载完成前先显示出来"""
+    global tk, ttk, messagebox, filedialog
+    if tk is not None:
+        return
+    
+    start = time.perf_counter()
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog
+    IMPORT_TIMINGS.setdefault("tkinter", time.perf_counter() - start)
+
+def load_gui_modules():
+    """导入Tk和matplotlib(TkAgg)并配置中文字体，仅在启动图形界面时调用"""
+    global plt, mdates, FigureCanvasTkAgg, NavigationToolbar2Tk, key_press_handler
+    load_tk_modules()
+    if plt is not None:
+        return
+    
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use('TkAgg')
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    from matplotlib.backend_bases import key_press_handler
+    from matplotlib import rcParams
+    IMPORT_TIMINGS.setdefault("matplotlib(TkAgg)", time.perf_counter() - start)
+    
+    # ========== 中文显示配置 ==========
+    if platform.system() == 'Windows':
+        rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
+        rcParams['axes.unicode_minus'] = False
+    elif platform.system() == 'Darwin':
+        rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Heiti TC']
+        rcParams['axes.unicode_minus'] = False
+    else:
+        rcParams['font.sans-serif'] = ['DejaVu Sans']
+        rcParams['axes.unicode_minus'] = False
+
+# ========== 本地缓存模块 ==========
+class FutureDayCache:
+    """按日期缓存已解析的期货数据（每天一个gzip压缩的JSON文件）"""
+    def __init__(self, cache_dir=None, refresh_days=3):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".futures_analysis", "day_cache")
+        self.cache_dir = cache_dir
+        # 最近refresh_days天内的数据可能还会更新，总是重新获取
+        self.refresh_days = refresh_days
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def _path(self, date_str):
+        return os.path.join(self.cache_dir, f"{date_str}.json.gz")
+    
+    def is_recent(self, date_str):
+        """判断日期是否仍在刷新窗口内"""
+        date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        return (datetime.now().date() - date).days < self.refresh_days
+    
+    def load_entry(self, date_str):
+        """读取缓存条目，不存在或损坏时返回None"""
+        path = self._path(date_str)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取{date_str}缓存失败: {e}")
+            return None
+    
+    def load(self, date_str):
+        """读取缓存的行数据，最近日期或无缓存时返回None"""
+        if self.is_recent(date_str):
+            return None
+        
+        entry = self.load_entry(date_str)
+        if entry is None:
+            return None
+        return entry.get("rows")
+    
+    def save(self, date_str, rows, validators=None):
+        """保存某天的行数据及HTTP缓存校验信息（ETag/Last-Modified），空结果不缓存"""
+        if not rows:
+            return
+        
+        entry = {"date": date_str, "rows": rows}
+        entry.update(validators or {})
+        
+        path = self._path(date_str)
+        tmp_path = path + ".tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入{date_str}缓存失败: {e}")
+
+class TradingCalendar:
+    """期货交易日历：剔除周末和交易所节假日，并根据实际获取结果自动补充"""
+    # 国内期货交易所休市日（仅列出工作日），新年度可在此补充
+    HOLIDAY_RANGES = [
+        ("2019-01-01", "2019-01-01"), ("2019-02-04", "2019-02-08"), ("2019-04-05", "2019-04-05"),
+        ("2019-05-01", "2019-05-03"), ("2019-06-07", "2019-06-07"), ("2019-09-13", "2019-09-13"),
+        ("2019-10-01", "2019-10-07"),
+        ("2020-01-01", "2020-01-01"), ("2020-01-24", "2020-01-31"), ("2020-04-06", "2020-04-06"),
+        ("2020-05-01", "2020-05-05"), ("2020-06-25", "2020-06-26"), ("2020-10-01", "2020-10-08"),
+        ("2021-01-01", "2021-01-01"), ("2021-02-11", "2021-02-17"), ("2021-04-05", "2021-04-05"),
+        ("2021-05-03", "2021-05-05"), ("2021-06-14", "2021-06-14"), ("2021-09-20", "2021-09-21"),
+        ("2021-10-01", "2021-10-07"),
+        ("2022-01-03", "2022-01-03"), ("2022-01-31", "2022-02-04"), ("2022-04-04", "2022-04-05"),
+        ("2022-05-02", "2022-05-04"), ("2022-06-03", "2022-06-03"), ("2022-09-12", "2022-09-12"),
+        ("2022-10-03", "2022-10-07"),
+        ("2023-01-02", "2023-01-02"), ("2023-01-23", "2023-01-27"), ("2023-04-05", "2023-04-05"),
+        ("2023-05-01", "2023-05-03"), ("2023-06-22", "2023-06-23"), ("2023-09-29", "2023-10-06"),
+        ("2024-01-01", "2024-01-01"), ("2024-02-09", "2024-02-16"), ("2024-04-04", "2024-04-05"),
+        ("2024-05-01", "2024-05-03"), ("2024-06-10", "2024-06-10"), ("2024-09-16", "2024-09-17"),
+        ("2024-10-01", "2024-10-07"),
+        ("2025-01-01", "2025-01-01"), ("2025-01-28", "2025-02-04"), ("2025-04-04", "2025-04-04"),
+        ("2025-05-01", "2025-05-05"), ("2025-06-02", "2025-06-02"), ("2025-10-01", "2025-10-08"),
+        ("2026-01-01", "2026-01-02"), ("2026-02-16", "2026-02-23"), ("2026-04-06", "2026-04-06"),
+        ("2026-05-01", "2026-05-05"), ("2026-06-19", "2026-06-19"), ("2026-09-25", "2026-09-25"),
+        ("2026-10-01", "2026-10-07"),
+    ]
+    
+    def __init__(self, state_path=None, min_age_days=3):
+        if state_path is None:
+            state_path = os.path.join(os.path.expanduser("~"), ".futures_analysis", "trading_calendar.json")
+        self.state_path = state_path
+        # 最近min_age_days天内的空结果可能只是数据尚未发布，不记为非交易日
+        self.min_age_days = min_age_days
+        
+        self.holidays = set()
+        for start_str, end_str in self.HOLIDAY_RANGES:
+            start = datetime.strptime(start_str, "%Y-%m-%d")
+            end = datetime.strptime(end_str, "%Y-%m-%d")
+            for i in range((end - start).days + 1):
+                self.holidays.add((start + timedelta(days=i)).strftime("%Y-%m-%d"))
+        
+        # 从实际获取结果中学习到的交易日和无数据日期
+        self.trading_days = set()
+        self.empty_days = set()
+        self._lock = threading.Lock()
+        self._load_state()
+    
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.trading_days = set(state.get("trading_days", []))
+            self.empty_days = set(state.get("empty_days", []))
+        except (OSError, ValueError) as e:
+            print(f"读取交易日历失败: {e}")
+    
+    def save(self):
+        """保存学习到的交易日信息"""
+        with self._lock:
+            state = {
+                "trading_days": sorted(self.trading_days),
+                "empty_days": sorted(self.empty_days),
+            }
+        
+        tmp_path = self.state_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"保存交易日历失败: {e}")
+    
+    def is_trading_day(self, date_str):
+        """判断日期是否可能为交易日"""
+        if date_str in self.trading_days:
+            return True
+        if date_str in self.empty_days:
+            return False
+        
+        date = datetime.strptime(date_str, "%Y-%m-%d")
+        if date.weekday() >= 5:
+            return False
+        return date_str not in self.holidays
+    
+    def filter_trading_days(self, date_list):
+        """剔除非交易日"""
+        return [date_str for date_str in date_list if self.is_trading_day(date_str)]
+    
+    def mark_trading_day(self, date_str):
+        """记录获取到数据的日期"""
+        with self._lock:
+            self.trading_days.add(date_str)
+            self.empty_days.discard(date_str)
+    
+    def mark_empty_day(self, date_str):
+        """记录没有数据的日期，之后不再请求"""
+        date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        if (datetime.now().date() - date).days < self.min_age_days:
+            return
+        
+        with self._lock:
+            if date_str not in self.trading_days:
+                self.empty_days.add(date_str)
 
 # ========== 数据获取模块 ==========
-class FutureDataFetcher:
+def create_default_fetcher(use_cache=True, max_workers=8):
+    """创建带本地缓存和交易日历的数据获取器（缓存目录不可用时退化为直接获取）"""
+    day_cache = None
+    if use_cache:
+        try:
+            day_cache = FutureDayCache()
+        except OSError as e:
+            print(f"无法创建本地缓存目录，将不使用缓存: {e}")
+    return FutureDataFetcher(max_workers=max_workers, cache=day_cache, calendar=TradingCalendar())
+
+class FutureDayParser:
+    """解析100ppi每日期现表页面：预编译XPath，直接从响应字节解析，单次遍历清理空白字符"""
     def __init__(self):
+        # lxml解析器和XPath对象不在线程间共享，每个线程使用自己的实例
+        self._html_parser = etree.HTMLParser(encoding="utf-8")
+        self._row_xpath = etree.XPath('//table[@id="fdata"]//tr[@align="center"] | //table[@id="fdata"]//tr/td[@colspan="8"]')
+        self._cell_xpath = etree.XPath('./td/a/text()|./td/text()|.//td/font/text()')
+    
+    def parse(self, content, date_str):
+        """解析页面字节，返回行数据列表（每行为HEADER对应的12个字段），没有数据时返回空列表"""
+        html = etree.fromstring(content, self._html_parser)
+        if html is None:
+            return []
+        
+        ret = []
+        exchange = ""
+        for ele in self._row_xpath(html):
+            if ele.tag == "td":
+                exchange = ele.text.strip() if ele.text else ""
+            elif ele.tag == "tr":
+                vals = []
+                for val in self._cell_xpath(ele):
+                    # 跳过纯空白文本；str.split()同时处理\xa0等特殊空白字符
+                    if val and val.isspace():
+                        continue
+                    vals.append(" ".join(val.split()))
+                
+                # 至少有商品、现货价格等基本信息
+                if len(vals) >= 10:
+                    vals.extend([date_str, exchange])
+                    ret.append(vals)
+        
+        return ret
+
+class FutureDataFetcher:
+    DAY_URL_TEMPLATE = "http://www.100ppi.com/sf/day-{}.html"
+    
+    def __init__(self, max_workers=8, min_request_interval=0.2, cache=None, calendar=None):
         self.HEADER = ["商品", "现货价格", "最近合约代码", "最近合约价格", "最近合约现期差1", 
                       "最近合约期现差百分比1", "主力合约代码", "主力合约价格", 
                       "主力合约现期差2", "主力合约现期差百分比2", "日期", "交易所"]
+        
+        # 并发获取配置：最大同时请求数，以及同一主机两次请求之间的最小间隔（秒）
+        self.max_workers = max_workers
+        self.min_request_interval = min_request_interval
+        self._host_lock = threading.Lock()
+        self._host_next_slot = {}
+        
+        # 本地按日缓存（FutureDayCache），为None时不使用缓存
+        self.cache = cache
+        # 交易日历（TradingCalendar），为None时请求所有自然日
+        self.calendar = calendar
+        self.last_fetch_stats = {"cached": 0, "fetched": 0, "skipped": 0, "failed": 0}
+        # 最近一次获取中因网络错误失败的日期（与无数据的日期区分）
+        self.last_failed_dates = []
+        
+        # 复用连接的会话：连接池大小与并发数一致，5xx和连接/读取超时按指数退避重试
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        retry = Retry(total=3, connect=3, read=3, status=3, backoff_factor=0.5,
+                      status_forcelist=(500, 502, 503, 504), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # 每个工作线程一个页面解析器
+        self._thread_local = threading.local()
+        # 保存原始页面的目录（用于解析器基准测试的样本），为None时不保存
+        self.raw_html_dir = None
+    
+    def _get_parser(self):
+        parser = getattr(self._thread_local, "parser", None)
+        if parser is None:
+            parser = FutureDayParser()
+            self._thread_local.parser = parser
+        return parser
+    
+    def _wait_for_host_slot(self, url):
+        """按主机限速，避免并发请求对数据源造成压力"""
+        host = urlparse(url).netloc
+        with self._host_lock:
+            now = time.monotonic()
+            slot = max(now, self._host_next_slot.get(host, 0))
+            self._host_next_slot[host] = slot + self.min_request_interval
+        
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
     
     def check_date_params(self, start_date_str, end_date_str):
         """检查日期参数格式"""
@@ -60,94 +406,721 @@ class FutureDataFetcher:
     
     def fetch_data_for_date(self, date_str):
         """获取指定日期的期货数据"""
-        url_template = "http://www.100ppi.com/sf/day-{}.html"
-        url = url_template.format(date_str)
+        rows, _, _ = self._fetch_day(date_str)
+        return rows
+    
+    def _fetch_day(self, date_str, cached_entry=None):
+        """
+        获取指定日期的期货数据
+        返回：(行数据, 状态, HTTP校验信息)，状态为ok/not_modified/empty/failed
+        cached_entry为本地缓存条目时发送条件请求，服务器返回304则直接使用缓存的行数据
+        """
+        url = self.DAY_URL_TEMPLATE.format(date_str)
+        
+        headers = {}
+        if cached_entry:
+            if cached_entry.get("etag"):
+                headers["If-None-Match"] = cached_entry["etag"]
+            if cached_entry.get("last_modified"):
+                headers["If-Modified-Since"] = cached_entry["last_modified"]
         
         try:
-            resp = requests.get(url, timeout=10)
-            resp.encoding = 'utf-8'
-            html = etree.HTML(resp.text)
+            self._wait_for_host_slot(url)
+            resp = self.session.get(url, headers=headers, timeout=10)
             
-            # 查找数据表格
-            ele_list = html.xpath('//table[@id="fdata"]//tr[@align="center"] | //table[@id="fdata"]//tr/td[@colspan="8"]')
-            ret = []
+            if resp.status_code == 304 and cached_entry:
+                return cached_entry.get("rows", []), "not_modified", {}
+            if resp.status_code >= 400:
+                print(f"获取{date_str}数据失败: HTTP {resp.status_code}")
+                return [], "failed", {}
             
-            if len(ele_list) == 0:
-                return ret
+            validators = {}
+            if resp.headers.get("ETag"):
+                validators["etag"] = resp.headers["ETag"]
+            if resp.headers.get("Last-Modified"):
+                validators["last_modified"] = resp.headers["Last-Modified"]
             
-            exchange = ""
-            for ele in ele_list:
-                if ele.tag == "td":
-                    exchange = ele.text.strip() if ele.text else ""
-                elif ele.tag == "tr":
-                    raw_vals = ele.xpath('./td/a/text()|./td/text()|.//td/font/text()')
-                    vals = []
-                    for val in raw_vals:
-                        if isinstance(val, str) and not re.match(r'^\s+$', val):
-                            # 清理特殊空白字符
-                            cleaned = re.sub(r'\s+', ' ', val.strip())
-                            # 处理特殊字符
-                            cleaned = re.sub(r'\xa0', ' ', cleaned)
-                            vals.append(cleaned)
-                    
-                    # 确保数据长度与表头一致
-                    if len(vals) >= 10:  # 至少有商品、现货价格等基本信息
-                        # 补齐缺失字段
-                        while len(vals) < 10:
-                            vals.append("")
-                        vals.extend([date_str, exchange])
-                        ret.append(vals)
+            if self.raw_html_dir:
+                with open(os.path.join(self.raw_html_dir, f"day-{date_str}.html"), "wb") as f:
+                    f.write(resp.content)
+            
+            ret = self._get_parser().parse(resp.content, date_str)
+            if not ret:
+                return ret, "empty", validators
             
-            return ret
+            return ret, "ok", validators
         except Exception as e:
             print(f"获取{date_str}数据失败: {e}")
-            return []
+            return [], "failed", {}
+    
+    def _fetch_and_cache(self, date_str):
+        """从网络获取某天数据并写入缓存，返回(行数据, 状态)"""
+        cached_entry = self.cache.load_entry(date_str) if self.cache is not None else None
+        daily_data, status, validators = self._fetch_day(date_str, cached_entry)
+        if self.cache is not None and status == "ok":
+            self.cache.save(date_str, daily_data, validators)
+        
+        if self.calendar is not None:
+            if daily_data:
+                self.calendar.mark_trading_day(date_str)
+            elif status == "empty":
+                self.calendar.mark_empty_day(date_str)
+        return daily_data, status
     
-    def get_future_data(self, start_date, end_date, progress_callback=None):
-        """获取指定日期范围的期货数据"""
+    def get_future_data(self, start_date, end_date, progress_callback=None, max_workers=None, use_cache=True):
+        """获取指定日期范围的期货数据（优先读取本地缓存，其余日期并发获取，结果按日期顺序合并）"""
         print(f"开始获取数据，从{start_date}到{end_date}")
         
         try:
             date_list = self.check_date_params(start_date, end_date)
-            all_data = []
+            
+            # 剔除周末、节假日和已知无数据的日期
+            skipped = 0
+            if self.calendar is not None:
+                trading_dates = self.calendar.filter_trading_days(date_list)
+                skipped = len(date_list) - len(trading_dates)
+                date_list = trading_dates
+            
             total_days = len(date_list)
+            self.last_failed_dates = []
+            if total_days == 0:
+                self.last_fetch_stats = {"cached": 0, "fetched": 0, "skipped": skipped, "failed": 0}
+                return normalize_future_data(pd.DataFrame([], columns=self.HEADER))
+            daily_results = [None] * total_days
             
+            # 先从本地缓存读取已有的历史日期
+            pending = []
             for i, date_str in enumerate(date_list):
-                if progress_callback:
-                    progress = (i + 1) / total_days * 100
-                    progress_callback(progress, f"正在获取 {date_str} 的数据...")
-                
-                daily_data = self.fetch_data_for_date(date_str)
+                rows = self.cache.load(date_str) if (use_cache and self.cache is not None) else None
+                if rows is None:
+                    pending.append(i)
+                else:
+                    daily_results[i] = rows
+                    if self.calendar is not None:
+                        self.calendar.mark_trading_day(date_str)
+            
+            completed = total_days - len(pending)
+            self.last_fetch_stats = {"cached": completed, "fetched": len(pending), "skipped": skipped, "failed": 0}
+            if progress_callback and completed:
+                progress_callback(completed / total_days * 100, f"从本地缓存读取 {completed} 天数据")
+            
+            if pending:
+                workers = max(1, min(max_workers or self.max_workers, len(pending)))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    future_to_index = {
+                        executor.submit(self._fetch_and_cache, date_list[i]): i
+                        for i in pending
+                    }
+                    
+                    for future in as_completed(future_to_index):
+                        i = future_to_index[future]
+                        daily_results[i], status = future.result()
+                        if status == "failed":
+                            self.last_failed_dates.append(date_list[i])
+                        completed += 1
+                        
+                        if progress_callback:
+                            progress = completed / total_days * 100
+                            progress_callback(progress, f"已获取 {date_list[i]} 的数据 ({completed}/{total_days})")
+            
+            if self.calendar is not None:
+                self.calendar.save()
+            
+            self.last_failed_dates.sort()
+            self.last_fetch_stats["failed"] = len(self.last_failed_dates)
+            
+            # 按日期顺序合并结果，并转换为紧凑类型（字符串列内存占用是数值和分类的数倍）
+            all_data = []
+            for daily_data in daily_results:
                 if daily_data:
                     all_data.extend(daily_data)
             
-            return pd.DataFrame(all_data, columns=self.HEADER)
+            return normalize_future_data(pd.DataFrame(all_data, columns=self.HEADER))
         except Exception as e:
             print(f"获取数据失败: {e}")
             return None
 
+# ========== 实时行情模块 ==========
+class QuoteProvider(ABC):
+    """实时行情源接口：子类必须实现get_quotes（未实现时无法实例化），返回 商品名 -> {"price": 最新价, "time": 行情时间}，取不到的商品不返回"""
+    name = "未命名行情源"
+    
+    def supports(self, product):
+        """是否能提供该商品的行情"""
+        return True
+    
+    @abstractmethod
+    def get_quotes(self, products):
+        """获取products中各商品的最新行情"""
+
+
+class FakeQuoteProvider(QuoteProvider):
+    """本地模拟行情：从给定价格开始随机游走，用于测试和离线演示"""
+    name = "模拟行情"
+    
+    def __init__(self, base_prices=None, volatility=0.002, seed=None):
+        self.prices = dict(base_prices or {})
+        self.volatility = volatility
+        self.random = np.random.default_rng(seed)
+    
+    def get_quotes(self, products):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        quotes = {}
+        for product in products:
+            price = self.prices.get(product)
+            if price is None:
+                continue
+            price *= 1 + self.random.normal(0, self.volatility)
+            self.prices[product] = price
+            quotes[product] = {"price": price, "time": now}
+        return quotes
+
+
+class SinaFuturesQuoteProvider(QuoteProvider):
+    """新浪财经国内期货实时行情（nf_品种代码0为主力连续合约），一次请求获取全部商品"""
+    name = "新浪期货"
+    URL = "https://hq.sinajs.cn/list={}"
+    HEADERS = {"Referer": "https://finance.sina.com.cn/"}
+    
+    # 100ppi商品名 -> 期货品种代码
+    SYMBOLS = {
+        "铜": "CU", "铝": "AL", "锌": "ZN", "铅": "PB", "镍": "NI", "锡": "SN", "黄金": "AU", "白银": "AG",
+        "螺纹钢": "RB", "线材": "WR", "热轧卷板": "HC", "不锈钢": "SS", "天然橡胶": "RU", "燃料油": "FU",
+        "石油沥青": "BU", "纸浆": "SP", "铁矿石": "I", "焦炭": "J", "焦煤": "JM", "硅铁": "SF", "锰硅": "SM",
+        "PTA": "TA", "甲醇": "MA", "玻璃": "FG", "纯碱": "SA", "尿素": "UR", "短纤": "PF", "棉花": "CF",
+        "白糖": "SR", "菜籽油": "OI", "菜籽粕": "RM", "苹果": "AP", "红枣": "CJ", "豆一": "A", "豆二": "B",
+        "豆粕": "M", "豆油": "Y", "棕榈油": "P", "玉米": "C", "玉米淀粉": "CS", "鸡蛋": "JD", "生猪": "LH",
+        "聚丙烯": "PP", "塑料": "L", "PVC": "V", "乙二醇": "EG", "苯乙烯": "EB", "液化石油气": "PG",
+        "工业硅": "SI", "碳酸锂": "LC",
+    }
+    
+    def __init__(self, session=None, symbols=None, timeout=5):
+        self.session = session or requests.Session()
+        self.symbols = dict(self.SYMBOLS if symbols is None else symbols)
+        self.timeout = timeout
+    
+    def supports(self, product):
+        return product in self.symbols
+    
+    def get_quotes(self, products):
+        codes = {f"nf_{self.symbols[p]}0": p for p in products if p in self.symbols}
+        if not codes:
+            return {}
+        
+        resp = self.session.get(self.URL.format(",".join(codes)), headers=self.HEADERS, timeout=self.timeout)
+        resp.raise_for_status()
+        resp.encoding = "gbk"
+        return self.parse(resp.text, codes)
+    
+    @staticmethod
+    def parse(text, codes):
+        """解析 var hq_str_nf_CU0="名称,时间,开盘,最高,最低,昨收,买价,卖价,最新价,...,日期"; 形式的多行响应"""
+        quotes = {}
+        for code, body in re.findall(r'hq_str_(\w+)="([^"]*)"', text):
+            product = codes.get(code)
+            fields = body.split(",")
+            if product is None or len(fields) < 9:
+                continue
+            try:
+                price = float(fields[8])
+            except ValueError:
+                continue
+            if price <= 0:
+                continue
+            quote_time = fields[1]
+            if len(quote_time) == 6 and quote_time.isdigit():
+                quote_time = f"{quote_time[:2]}:{quote_time[2:4]}:{quote_time[4:]}"
+            if len(fields) > 17 and fields[17]:
+                quote_time = f"{fields[17]} {quote_time}"
+            quotes[product] = {"price": price, "time": quote_time}
+        return quotes
+
+
+class QuotePoller:
+    """后台线程按固定间隔轮询行情源，每次取到行情后调用on_quotes(quotes)（在轮询线程中调用）"""
+    
+    def __init__(self, provider, products, interval=30, on_quotes=None, on_error=None):
+        self.provider = provider
+        self.products = list(products)
+        self.interval = interval
+        self.on_quotes = on_quotes
+        self.on_error = on_error
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def set_products(self, products):
+        self.products = list(products)
+    
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop_event.set()
+    
+    def poll_once(self):
+        """立即获取一次行情"""
+        quotes = self.provider.get_quotes(self.products)
+        if quotes and self.on_quotes is not None:
+            self.on_quotes(quotes)
+        return quotes
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+                else:
+                    print(f"获取实时行情失败: {e}")
+            self._stop_event.wait(self.interval)
+
+# ========== 本地数据库模块 ==========
+FUTURE_NUMERIC_COLUMNS = ["现货价格", "最近合约价格", "主力合约价格", "最近合约现期差1", "主力合约现期差2"]
+FUTURE_PERCENT_COLUMNS = ["最近合约期现差百分比1", "主力合约现期差百分比2"]
+FUTURE_CATEGORY_COLUMNS = ["商品", "交易所", "最近合约代码", "主力合约代码"]
+# 价格保持float64：沪镍等商品价格超过131072时float32的精度不足1/64，无法还原2位小数的原始价格
+# （用字符串表示dtype，导入本模块时不会触发numpy的延迟导入）
+FUTURE_FLOAT_DTYPE = "float64"
+
+def _to_future_float(values, strip_percent=False):
+    """字符串（可带%号）或数值列转换为FUTURE_FLOAT_DTYPE，无法解析的值（空字符串等）为NaN"""
+    if not pd.api.types.is_numeric_dtype(values):
+        text = values.astype(str)
+        if strip_percent:
+            text = text.str.rstrip("%")
+        try:
+            # 整列都是合法数字时直接转换，比逐个容错解析快数倍
+            values = text.astype(FUTURE_FLOAT_DTYPE)
+        except (ValueError, TypeError):
+            values = pd.to_numeric(text.str.strip(), errors='coerce')
+    return values.astype(FUTURE_FLOAT_DTYPE)
+
+def normalize_future_data(data):
+    """
+    将期货数据转换为分析所需的紧凑类型，已转换的列直接跳过：
+    价格为float64，百分比去掉%号后为float64（1.23%即1.23），日期为datetime64，商品、交易所和合约代码为分类
+    """
+    for col in FUTURE_NUMERIC_COLUMNS + FUTURE_PERCENT_COLUMNS:
+        if col in data.columns and data[col].dtype != FUTURE_FLOAT_DTYPE:
+            data[col] = _to_future_float(data[col], strip_percent=col in FUTURE_PERCENT_COLUMNS)
+    
+    if "日期" in data.columns and not pd.api.types.is_datetime64_any_dtype(data["日期"]):
+        data["日期"] = pd.to_datetime(data["日期"], errors='coerce')
+    
+    for col in FUTURE_CATEGORY_COLUMNS:
+        if col in data.columns and not isinstance(data[col].dtype, pd.CategoricalDtype):
+            data[col] = data[col].astype("category")
+    
+    return data
+
+class FutureDataStore:
+    """本地列式数据库：按月分区保存为Parquet文件，数据类型已转换好，无需重复解析"""
+    def __init__(self, store_dir=None):
+        if store_dir is None:
+            store_dir = os.path.join(os.path.expanduser("~"), ".futures_analysis", "store")
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+    
+    def _partition_path(self, month):
+        return os.path.join(self.store_dir, f"{month}.parquet")
+    
+    def list_partitions(self):
+        """返回已有的月份分区（YYYY-MM），按时间排序"""
+        months = []
+        for name in os.listdir(self.store_dir):
+            if name.endswith(".parquet"):
+                months.append(name[:-len(".parquet")])
+        return sorted(months)
+    
+    def append(self, data):
+        """按月分区追加数据，同一商品同一日期以新数据为准，返回写入的分区列表"""
+        if data is None or data.empty:
+            return []
+        
+        data = normalize_future_data(data.copy()).dropna(subset=["日期"])
+        months = data["日期"].dt.strftime("%Y-%m")
+        written = []
+        
+        for month, part in data.groupby(months):
+            path = self._partition_path(month)
+            if os.path.exists(path):
+                part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+            
+            part = part.drop_duplicates(subset=["商品", "日期"], keep="last")
+            part = normalize_future_data(part.sort_values(["日期", "商品"]).reset_index(drop=True))
+            
+            tmp_path = path + ".tmp"
+            part.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            written.append(month)
+        
+        return written
+    
+    def load(self, start_date=None, end_date=None):
+        """读取本地数据，可按日期（YYYY-MM-DD）范围过滤，无数据时返回None"""
+        months = self.list_partitions()
+        if start_date:
+            months = [m for m in months if m >= start_date[:7]]
+        if end_date:
+            months = [m for m in months if m <= end_date[:7]]
+        if not months:
+            return None
+        
+        data = pd.concat([pd.read_parquet(self._partition_path(m)) for m in months], ignore_index=True)
+        if start_date:
+            data = data[data["日期"] >= pd.Timestamp(start_date)]
+        if end_date:
+            data = data[data["日期"] <= pd.Timestamp(end_date)]
+        
+        # 不同分区的分类取值不同，合并后需重新转换为分类类型
+        return normalize_future_data(data.reset_index(drop=True))
+
 # ========== 数据分析模块 ==========
+# scipy.stats.percentileofscore：首次使用时确定scipy是否可用（None表示尚未确定，False表示不可用）
+_scipy_percentileofscore = None
+
+def percentileofscore_weak(values, score):
+    """score在values中的百分位（percentileofscore kind='weak'），scipy只在第一次调用时尝试导入"""
+    global _scipy_percentileofscore
+    if _scipy_percentileofscore is None:
+        try:
+            _scipy_percentileofscore = timed_import("scipy.stats").percentileofscore
+        except ImportError:
+            _scipy_percentileofscore = False
+    
+    if _scipy_percentileofscore:
+        return _scipy_percentileofscore(values, score, kind='weak')
+    
+    # 没有scipy时使用简单方法：不高于score的数据所占比例
+    sorted_values = np.sort(np.asarray(values, dtype=float))
+    return np.searchsorted(sorted_values, score, side="right") / len(sorted_values) * 100
+
+def classify_price_percentile(percentile):
+    """根据百分位判断价格状态，返回(状态描述, 颜色)"""
+    if percentile >= 99:
+        return "价格极端高估（超过99%历史价格）", "red"
+    elif percentile >= 80:
+        return "价格高估（超过80%历史价格）", "orange"
+    elif percentile <= 1:
+        return "价格极端低估（低于99%历史价格）", "darkgreen"
+    elif percentile <= 20:
+        return "价格低估（低于80%历史价格）", "green"
+    else:
+        return "价格处于合理区间", "blue"
+
+class RollingPercentileTracker:
+    """
+    增量维护单个价格序列的有序数组
+    追加数据时二分插入，最新值百分位、任意分位点和滚动窗口百分位均通过二分查找得到，无需重新扫描历史
+    """
+    def __init__(self, windows=(250, 500, 1000)):
+        self.values = []          # 按时间顺序
+        self.sorted_values = []   # 全部数据的有序数组
+        self.window_sorted = {window: [] for window in windows}
+        # 平移后的累加和，用于O(1)计算均值和标准差
+        self._shift = None
+        self._sum = 0.0
+        self._sum_sq = 0.0
+    
+    def __len__(self):
+        return len(self.values)
+    
+    @property
+    def latest(self):
+        return self.values[-1] if self.values else None
+    
+    def append(self, value):
+        """追加一个新数据点（需按时间顺序追加）"""
+        value = float(value)
+        if math.isnan(value):
+            return
+        
+        self.values.append(value)
+        bisect.insort(self.sorted_values, value)
+        
+        if self._shift is None:
+            self._shift = value
+        self._sum += value - self._shift
+        self._sum_sq += (value - self._shift) ** 2
+        
+        for window, window_values in self.window_sorted.items():
+            bisect.insort(window_values, value)
+            if len(window_values) > window:
+                expired = self.values[-window - 1]
+                del window_values[bisect.bisect_left(window_values, expired)]
+    
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+    
+    def _sorted(self, window=None):
+        if window is None or window >= len(self.values):
+            return self.sorted_values
+        return self.window_sorted[window]
+    
+    def percentile_of(self, value, window=None):
+        """任意价格在全部（或窗口内）数据中的百分位（与percentileofscore kind='weak'一致）"""
+        sorted_values = self._sorted(window)
+        if not sorted_values:
+            return None
+        return bisect.bisect_right(sorted_values, value) / len(sorted_values) * 100
+    
+    def latest_percentile(self, window=None):
+        """最新价格在历史数据（不含最新价格本身）中的百分位"""
+        sorted_values = self._sorted(window)
+        if len(sorted_values) < 2:
+            return None
+        return (bisect.bisect_right(sorted_values, self.latest) - 1) / (len(sorted_values) - 1) * 100
+    
+    def historical_quantile(self, q, window=None):
+        """历史数据（不含最新价格）的分位点，线性插值，与np.percentile一致"""
+        sorted_values = self._sorted(window)
+        n = len(sorted_values) - 1
+        if n < 1:
+            return None
+        
+        # 跳过最新价格在有序数组中的位置
+        latest_pos = bisect.bisect_left(sorted_values, self.latest)
+        
+        def hist_value(k):
+            return sorted_values[k] if k < latest_pos else sorted_values[k + 1]
+        
+        pos = (n - 1) * q / 100
+        lower = int(math.floor(pos))
+        upper = min(lower + 1, n - 1)
+        low_value = hist_value(lower)
+        return low_value + (hist_value(upper) - low_value) * (pos - lower)
+    
+    def historical_mean_std(self):
+        """历史数据（不含最新价格）的均值和样本标准差"""
+        n = len(self.values) - 1
+        if n < 1:
+            return None, None
+        
+        latest = self.latest - self._shift
+        total = self._sum - latest
+        mean = total / n + self._shift
+        if n < 2:
+            return mean, float("nan")
+        variance = (self._sum_sq - latest ** 2 - total ** 2 / n) / (n - 1)
+        return mean, math.sqrt(max(variance, 0.0))
+
+class FuturePercentileEngine:
+    """按(商品, 序列)维护RollingPercentileTracker，数据追加时增量更新"""
+    SERIES_COLUMNS = {
+        "spot": "现货价格",
+        "future": "主力合约价格",
+        "basis": None,  # 基差 = 现货价格 - 主力合约价格
+    }
+    
+    def __init__(self, windows=(250, 500, 1000)):
+        self.windows = tuple(windows)
+        self._trackers = {}    # (商品, 序列) -> RollingPercentileTracker
+        self._last_dates = {}  # 商品 -> 已纳入的最新日期
+    
+    def reset(self):
+        self._trackers = {}
+        self._last_dates = {}
+    
+    @classmethod
+    def series_values(cls, product_data, series):
+        """从按日期排序的商品数据中取出某个序列（去除缺失值）"""
+        column = cls.SERIES_COLUMNS[series]
+        if column is not None:
+            if column not in product_data.columns:
+                return None
+            return product_data[column].dropna()
+        
+        if "现货价格" not in product_data.columns or "主力合约价格" not in product_data.columns:
+            return None
+        return (product_data["现货价格"] - product_data["主力合约价格"]).dropna()
+    
+    def get_tracker(self, product, series, product_data=None):
+        """获取跟踪器，不存在时根据商品数据（按日期排序）构建；未提供商品数据时返回None"""
+        key = (product, series)
+        tracker = self._trackers.get(key)
+        if tracker is None and product_data is not None:
+            values = self.series_values(product_data, series)
+            if values is None:
+                return None
+            tracker = RollingPercentileTracker(self.windows)
+            tracker.extend(values.to_numpy(dtype=float))
+            self._trackers[key] = tracker
+            if len(product_data):
+                self._last_dates[product] = product_data["日期"].iloc[-1]
+        return tracker
+    
+    def tracks(self, product):
+        """是否已为该商品建立跟踪器"""
+        return any((product, series) in self._trackers for series in self.SERIES_COLUMNS)
+    
+    def on_append(self, product, new_rows):
+        """商品追加了新数据：日期都在已有数据之后时增量追加，否则丢弃该商品的跟踪器待下次重建（其他商品不受影响）"""
+        if not self.tracks(product):
+            return
+        
+        new_rows = new_rows.sort_values("日期", kind="stable")
+        last_date = self._last_dates.get(product)
+        if last_date is None or pd.isna(last_date) or new_rows["日期"].min() <= last_date:
+            for series in self.SERIES_COLUMNS:
+                self._trackers.pop((product, series), None)
+            self._last_dates.pop(product, None)
+            return
+        
+        for series in self.SERIES_COLUMNS:
+            tracker = self._trackers.get((product, series))
+            values = self.series_values(new_rows, series)
+            if tracker is not None and values is not None:
+                tracker.extend(values.to_numpy(dtype=float))
+        self._last_dates[product] = new_rows["日期"].iloc[-1]
+    
+    def analyze(self, product, series, product_data):
+        """返回与analyze_price_position相同结构的分析结果，另含滚动窗口百分位"""
+        tracker = self.get_tracker(product, series, product_data)
+        if tracker is None or len(tracker) < 2:
+            return {"status": "数据不足"}
+        
+        percentile = tracker.latest_percentile()
+        status, color = classify_price_percentile(percentile)
+        mean, std = tracker.historical_mean_std()
+        n = len(tracker) - 1
+        
+        return {
+            "current_price": tracker.latest,
+            "percentile": percentile,
+            "status": status,
+            "color": color,
+            "historical_mean": mean,
+            "historical_std": std,
+            "historical_80_percentile": tracker.historical_quantile(80),
+            "historical_20_percentile": tracker.historical_quantile(20),
+            "historical_99_percentile": tracker.historical_quantile(99 if n >= 100 else min(99, 100 * (n - 1) / n)),
+            "historical_1_percentile": tracker.historical_quantile(1 if n >= 100 else max(1, 100 / n)),
+            "historical_min": tracker.historical_quantile(0),
+            "historical_max": tracker.historical_quantile(100),
+            "data_points": len(tracker),
+            "window_percentiles": {
+                window: tracker.latest_percentile(window)
+                for window in self.windows if len(tracker) > window
+            },
+        }
+    
+    def quote_position(self, tracker, price):
+        """实时价格在历史分布（全部已收盘数据）中的位置，只做二分查找，不重新分析"""
+        if tracker is None or len(tracker) == 0:
+            return None
+        
+        percentile = tracker.percentile_of(price)
+        status, color = classify_price_percentile(percentile)
+        last_close = tracker.latest
+        return {
+            "price": price,
+            "percentile": percentile,
+            "status": status,
+            "color": color,
+            "last_close": last_close,
+            "change_pct": (price / last_close - 1) * 100 if last_close else None,
+            "window_percentiles": {
+                window: tracker.percentile_of(price, window)
+                for window in self.windows if len(tracker) > window
+            },
+        }
+
 class FutureDataAnalyzer:
     def __init__(self):
         self.data = None
         self.current_product = None
+        # 商品索引：商品名 -> 按日期排序的行位置数组
+        self.product_index = {}
+        # 数据版本号，数据变化时递增，供缓存判断是否失效
+        self.data_version = 0
+        # 增量百分位引擎（现货、主力合约、基差）
+        self.percentile_engine = FuturePercentileEngine()
+        # 全部商品的百分位历史缓存：列名 -> (数据版本号, 宽表)
+        self.percentile_history_cache = {}
+        # 全部商品的衍生指标缓存：(数据版本号, 长表)
+        self.indicator_cache = None
     
     def set_data(self, data):
         """设置分析数据"""
         self.data = data
+        self.product_index = {}
+        self.data_version += 1
+        self.percentile_engine.reset()
         
-        # 清洗和转换数据
+        # 清洗和转换数据（从本地数据库读取的数据已是目标类型，不会重复转换）
         if self.data is not None and not self.data.empty:
-            # 转换数值列
-            numeric_columns = ["现货价格", "最近合约价格", "主力合约价格", 
-                             "最近合约现期差1", "主力合约现期差2"]
-            for col in numeric_columns:
-                if col in self.data.columns:
-                    self.data[col] = pd.to_numeric(self.data[col].replace('', np.nan), errors='coerce')
-            
-            # 转换日期列
-            if "日期" in self.data.columns:
-                self.data["日期"] = pd.to_datetime(self.data["日期"], errors='coerce')
+            normalize_future_data(self.data)
+            self.product_index = self._build_product_index(self.data)
+    
+    def _build_product_index(self, frame, offset=0):
+        """按商品分组并按日期排序，返回 商品名 -> 行位置数组（位置加上offset）"""
+        order = np.argsort(frame["日期"].to_numpy(), kind="stable")
+        products = frame["商品"]
+        if isinstance(products.dtype, pd.CategoricalDtype):
+            # 按分类编码（整数）分组，比按字符串分组快得多
+            names = products.cat.categories
+            grouped = pd.Series(order).groupby(products.cat.codes.to_numpy()[order], sort=False).indices
+            return {names[code]: order[positions] + offset for code, positions in grouped.items() if code >= 0}
+        grouped = pd.Series(order).groupby(products.to_numpy()[order], sort=False).indices
+        return {product: order[positions] + offset for product, positions in grouped.items()}
+    
+    def append_data(self, new_data):
+        """追加新数据（如新获取的交易日），只更新受影响商品的索引，返回实际追加的行数"""
+        if new_data is None or new_data.empty:
+            return 0
+        if self.data is None or self.data.empty:
+            self.set_data(new_data.reset_index(drop=True))
+            return len(self.data)
+        
+        new_data = normalize_future_data(new_data.copy())
+        
+        # 已存在的(商品, 日期)不重复追加（历史交易日数据不会变化），新数据内部的重复行也只保留一行
+        new_data = new_data.drop_duplicates(["商品", "日期"], keep="last")
+        # 只有日期不早于新数据的已有行可能重复，不需要为全部历史建立键
+        recent = self.data.loc[self.data["日期"] >= new_data["日期"].min(), ["商品", "日期"]]
+        existing_keys = pd.MultiIndex.from_arrays([recent["商品"].astype(object), recent["日期"]])
+        new_keys = pd.MultiIndex.from_arrays([new_data["商品"].astype(object), new_data["日期"]])
+        new_data = new_data[~new_keys.isin(existing_keys)]
+        if new_data.empty:
+            return 0
+        
+        # 统一分类取值，使合并后仍保持分类类型（在浅拷贝上修改，界面仍在使用的旧表不受影响）
+        old_data = self.data.copy(deep=False)
+        for col in FUTURE_CATEGORY_COLUMNS:
+            if col in old_data.columns and col in new_data.columns:
+                added = new_data[col].cat.categories.difference(old_data[col].cat.categories)
+                if len(added):
+                    old_data[col] = old_data[col].cat.add_categories(added)
+                new_data[col] = new_data[col].cat.set_categories(old_data[col].cat.categories)
+        
+        offset = len(old_data)
+        self.data = normalize_future_data(pd.concat([old_data, new_data], ignore_index=True))
+        
+        # 只对新数据涉及的商品合并索引；已建立百分位跟踪器的商品把新增的行交给跟踪器增量更新
+        dates = self.data["日期"].to_numpy()
+        appended = self.data.iloc[offset:]
+        for product, rows in self._build_product_index(appended, offset).items():
+            old_rows = self.product_index.get(product)
+            if old_rows is None:
+                self.product_index[product] = rows
+            else:
+                merged = np.concatenate([old_rows, rows])
+                self.product_index[product] = merged[np.argsort(dates[merged], kind="stable")]
+            if self.percentile_engine.tracks(product):
+                self.percentile_engine.on_append(product, appended.iloc[rows - offset])
+        
+        self.data_version += 1
+        return len(new_data)
     
     def get_available_products(self):
         """获取可用的商品列表"""
@@ -170,31 +1143,10 @@ class FutureDataAnalyzer:
         historical_prices = price_series.iloc[:-1]
         
         # 计算当前价格在历史价格中的百分位
-        try:
-            from scipy import stats
-            percentile = stats.percentileofscore(historical_prices, current_price, kind='weak')
-        except:
-            # 如果没有scipy，使用简单方法
-            sorted_prices = historical_prices.sort_values()
-            idx = sorted_prices.searchsorted(current_price)
-            percentile = (idx / len(sorted_prices)) * 100
+        percentile = percentileofscore_weak(historical_prices, current_price)
         
         # 根据百分位判断价格状态
-        if percentile >= 99:
-            status = "价格极端高估（超过99%历史价格）"
-            color = "red"
-        elif percentile >= 80:
-            status = "价格高估（超过80%历史价格）"
-            color = "orange"
-        elif percentile <= 1:
-            status = "价格极端低估（低于99%历史价格）"
-            color = "darkgreen"
-        elif percentile <= 20:
-            status = "价格低估（低于80%历史价格）"
-            color = "green"
-        else:
-            status = "价格处于合理区间"
-            color = "blue"
+        status, color = classify_price_percentile(percentile)
         
         return {
             "current_price": current_price,
@@ -212,37 +1164,204 @@ class FutureDataAnalyzer:
             "data_points": len(price_series)
         }
     
+    def batch_scan(self, column="主力合约价格"):
+        """
+        一次性计算所有商品的价格位置
+        返回：每个商品一行的DataFrame（当前价格、百分位、状态、历史均值/标准差、1/20/80/99分位点等）
+        """
+        result_columns = ["商品", "当前价格", "百分位", "状态", "颜色", "历史均值", "历史标准差",
+                          "1%分位", "20%分位", "80%分位", "99%分位", "历史最低", "历史最高",
+                          "数据点数", "最新日期"]
+        if self.data is None or self.data.empty or column not in self.data.columns:
+            return pd.DataFrame(columns=result_columns)
+        
+        # 按商品、日期排序，使每个商品的数据连续，且最后一行为最新价格
+        frame = self.data.loc[self.data[column].notna() & self.data["商品"].notna(), ["商品", "日期", column]]
+        frame = frame.sort_values(["商品", "日期"], kind="mergesort")
+        
+        if frame.empty:
+            result = pd.DataFrame(columns=result_columns)
+        else:
+            group_ids, _ = pd.factorize(frame["商品"], sort=False)
+            values = frame[column].to_numpy(dtype=float)
+            row_count = len(values)
+        
+            starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+            ends = np.r_[starts[1:], row_count].astype(int)
+            counts = ends - starts
+            group_count = len(starts)
+        
+            current = values[ends - 1]
+            hist_counts = counts - 1
+            valid = hist_counts >= 1
+        
+            # 历史数据 = 每个商品除最新一行外的所有数据
+            is_hist = np.ones(row_count, dtype=bool)
+            is_hist[ends - 1] = False
+            hist_group = np.repeat(np.arange(group_count), counts)[is_hist]
+            hist_values = values[is_hist]
+        
+            with np.errstate(invalid="ignore", divide="ignore"):
+                # 百分位（与scipy percentileofscore kind='weak'一致）
+                below_or_equal = np.bincount(hist_group, weights=hist_values <= current[hist_group], minlength=group_count)
+                percentile = below_or_equal / hist_counts * 100
+            
+                mean = np.bincount(hist_group, weights=hist_values, minlength=group_count) / hist_counts
+                squared_dev = np.bincount(hist_group, weights=(hist_values - mean[hist_group]) ** 2, minlength=group_count)
+                std = np.sqrt(squared_dev / (hist_counts - 1))
+        
+            # 组内按价格排序，用于计算分位点和最值
+            order = np.lexsort((hist_values, hist_group))
+            sorted_values = hist_values[order]
+            hist_starts = np.r_[0, np.cumsum(hist_counts)[:-1]].astype(int)
+        
+            def sorted_quantile(q):
+                """按组计算线性插值分位点（与np.percentile一致），q可为每组不同的百分数"""
+                n = np.maximum(hist_counts, 1)
+                pos = (n - 1) * np.asarray(q, dtype=float) / 100
+                lower = np.floor(pos).astype(int)
+                upper = np.minimum(lower + 1, n - 1)
+                frac = pos - lower
+                if len(sorted_values) == 0:
+                    return np.full(group_count, np.nan)
+                low_values = sorted_values[np.where(valid, hist_starts + lower, 0)]
+                high_values = sorted_values[np.where(valid, hist_starts + upper, 0)]
+                return np.where(valid, low_values + (high_values - low_values) * frac, np.nan)
+        
+            # 历史数据少于100个时，1%/99%分位点按样本数收窄（与analyze_price_position一致）
+            n = np.maximum(hist_counts, 1)
+            q99 = np.where(hist_counts >= 100, 99, np.minimum(99, 100 * (n - 1) / n))
+            q1 = np.where(hist_counts >= 100, 1, np.maximum(1, 100 / n))
+        
+            percentile = np.where(valid, percentile, np.nan)
+            conditions = [percentile >= 99, percentile >= 80, percentile <= 1, percentile <= 20]
+            status = np.select(conditions, ["价格极端高估（超过99%历史价格）", "价格高估（超过80%历史价格）",
+                                            "价格极端低估（低于99%历史价格）", "价格低估（低于80%历史价格）"],
+                               default="价格处于合理区间")
+            color = np.select(conditions, ["red", "orange", "darkgreen", "green"], default="blue")
+        
+            result = pd.DataFrame({
+                "商品": frame["商品"].to_numpy()[starts],
+                "当前价格": current,
+                "百分位": percentile,
+                "状态": np.where(valid, status, "数据不足"),
+                "颜色": np.where(valid, color, "black"),
+                "历史均值": np.where(valid, mean, np.nan),
+                "历史标准差": np.where(valid, std, np.nan),
+                "1%分位": sorted_quantile(q1),
+                "20%分位": sorted_quantile(20),
+                "80%分位": sorted_quantile(80),
+                "99%分位": sorted_quantile(q99),
+                "历史最低": sorted_quantile(0),
+                "历史最高": sorted_quantile(100),
+                "数据点数": counts,
+                "最新日期": frame["日期"].to_numpy()[ends - 1],
+            }, columns=result_columns)
+        
+        # 没有有效价格的商品也保留一行，标记为数据不足
+        result = result.set_index("商品").reindex(self.get_available_products()).reset_index()
+        result["商品"] = result["商品"].astype(str)
+        result["状态"] = result["状态"].fillna("数据不足")
+        result["颜色"] = result["颜色"].fillna("black")
+        result["数据点数"] = result["数据点数"].fillna(0).astype(int)
+        return result
+    
+    def quote_position(self, product_name, price, series="future"):
+        """实时价格相对该商品历史分布的位置；跟踪器已存在时不访问原始数据"""
+        engine = self.percentile_engine
+        tracker = engine.get_tracker(product_name, series)
+        if tracker is None:
+            rows = self.product_index.get(product_name)
+            if rows is None or len(rows) == 0:
+                return None
+            tracker = engine.get_tracker(product_name, series, self.data.iloc[rows])
+        return engine.quote_position(tracker, price)
+    
+    def percentile_history(self, column="主力合约价格"):
+        """
+        一次性计算所有商品每个交易日的历史百分位（当日价格在此前全部历史价格中的位置，与analyze_price_position一致）
+        返回：宽表，行为日期、列为商品；结果按数据版本号缓存，数据变化后重新计算
+        """
+        cached = self.percentile_history_cache.get(column)
+        if cached is not None and cached[0] == self.data_version:
+            return cached[1]
+        
+        if self.data is None or self.data.empty or column not in self.data.columns:
+            return pd.DataFrame()
+        
+        frame = self.data.loc[self.data[column].notna() & self.data["商品"].notna(), ["商品", "日期", column]]
+        frame = frame.sort_values(["商品", "日期"], kind="mergesort")
+        frame["商品"] = frame["商品"].astype(object)
+        
+        # 扩展窗口内按最大名次排名：名次-1 即此前历史中不高于当日价格的天数（percentileofscore kind='weak'）
+        grouped = frame.groupby("商品", sort=False)[column]
+        rank = grouped.expanding().rank(method="max").to_numpy()
+        history_count = grouped.cumcount().to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            percentile = np.where(history_count > 0, (rank - 1) / history_count * 100, np.nan)
+        
+        history = pd.DataFrame({"日期": frame["日期"].to_numpy(), "商品": frame["商品"].to_numpy(),
+                                "百分位": percentile})
+        history = history.drop_duplicates(["日期", "商品"], keep="last")
+        wide = history.pivot(index="日期", columns="商品", values="百分位").sort_index()
+        
+        self.percentile_history_cache[column] = (self.data_version, wide)
+        return wide
+    
+    def get_indicators(self):
+        """所有商品的衍生指标（期限价差、基差Z分数、年化基差率、波动率），按数据版本号缓存"""
+        if self.indicator_cache is not None and self.indicator_cache[0] == self.data_version:
+            return self.indicator_cache[1]
+        
+        indicators = compute_future_indicators(self.data)
+        self.indicator_cache = (self.data_version, indicators)
+        return indicators
+    
+    def indicator_scan(self):
+        """每个商品最新交易日的衍生指标，一行一个商品，用于全市场筛选"""
+        indicators = self.get_indicators()
+        if indicators.empty:
+            return indicators
+        latest = indicators.groupby("商品", sort=False, observed=True).tail(1)
+        return latest.rename(columns={"日期": "最新日期"}).reset_index(drop=True)
+    
+    def product_indicators(self, product_name):
+        """单个商品最新交易日的衍生指标（字典），没有数据时返回None"""
+        indicators = self.get_indicators()
+        if indicators.empty:
+            return None
+        rows = indicators[indicators["商品"] == product_name]
+        return rows.iloc[-1].to_dict() if len(rows) else None
+    
     def analyze_product(self, product_name):
         """分析指定商品的价格状态（根据新要求）"""
         if self.data is None or self.data.empty:
             return None, "无数据可供分析"
         
-        # 过滤指定商品的数据
-        product_data = self.data[self.data["商品"] == product_name].copy()
-        if product_data.empty:
+        # 通过商品索引取出该商品的数据（索引已按日期排序）
+        rows = self.product_index.get(product_name)
+        if rows is None or len(rows) == 0:
             return None, f"未找到商品'{product_name}'的数据"
         
         self.current_product = product_name
+        product_data = self.data.iloc[rows].copy()
         
-        # 按日期排序
-        product_data = product_data.sort_values("日期")
-        
-        # 分析现货价格
+        # 分析现货价格、主力合约价格和基差（使用增量百分位引擎）
+        engine = self.percentile_engine
         if "现货价格" in product_data.columns:
-            spot_analysis = self.analyze_price_position(product_data["现货价格"].dropna())
+            spot_analysis = engine.analyze(product_name, "spot", product_data)
         else:
             spot_analysis = {"status": "现货价格数据缺失"}
         
-        # 分析主力合约价格
         if "主力合约价格" in product_data.columns:
-            future_analysis = self.analyze_price_position(product_data["主力合约价格"].dropna())
+            future_analysis = engine.analyze(product_name, "future", product_data)
         else:
             future_analysis = {"status": "主力合约价格数据缺失"}
         
         # 计算基差
         if "现货价格" in product_data.columns and "主力合约价格" in product_data.columns:
             product_data["基差"] = product_data["现货价格"] - product_data["主力合约价格"]
-            basis_analysis = self.analyze_price_position(product_data["基差"].dropna())
+            basis_analysis = engine.analyze(product_name, "basis", product_data)
         else:
             basis_analysis = {"status": "无法计算基差"}
         
@@ -284,6 +1403,13 @@ class FutureDataAnalyzer:
         # 生成操作建议
         recommendation = self.generate_recommendation(future_info)
         
+        def window_line(info):
+            """滚动窗口百分位（历史数据长于窗口时才显示）"""
+            windows = info.get("window_percentiles") or {}
+            if not windows:
+                return ""
+            return "滚动窗口百分位: " + " | ".join(f"近{w}日 {p:.1f}%" for w, p in windows.items()) + "\n"
+        
         summary = f"""
 【{product_name}价格分析报告】
 分析日期: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -305,6 +1431,7 @@ class FutureDataAnalyzer:
   1%分位点(极端低估): {spot_info['historical_1_percentile']:.2f}
   99%分位点(极端高估): {spot_info['historical_99_percentile']:.2f}
 """
+            summary += window_line(spot_info)
         else:
             summary += "现货价格数据不足或缺失\n"
         
@@ -321,6 +1448,7 @@ class FutureDataAnalyzer:
   1%分位点(极端低估): {future_info['historical_1_percentile']:.2f}
   99%分位点(极端高估): {future_info['historical_99_percentile']:.2f}
 """
+            summary += window_line(future_info)
         else:
             summary += "主力合约价格数据不足或缺失\n"
         
@@ -332,9 +1460,24 @@ class FutureDataAnalyzer:
 历史基差范围: {basis_info['historical_min']:.2f} - {basis_info['historical_max']:.2f}
 历史均值: {basis_info['historical_mean']:.2f}
 """
+            summary += window_line(basis_info)
         else:
             summary += "基差数据不足或缺失\n"
         
+        summary += "\n================================\n【衍生指标】\n"
+        indicators = self.product_indicators(product_name)
+        if indicators is not None:
+            def fmt(value, digits=2, suffix=""):
+                return f"{value:.{digits}f}{suffix}" if pd.notna(value) else "N/A"
+            
+            summary += f"""期限价差(近月-主力): {fmt(indicators['期限价差'])} ({fmt(indicators['期限价差率(%)'], 2, '%')})
+基差Z分数(近{INDICATOR_ZSCORE_WINDOW}日): {fmt(indicators['基差Z分数'])}
+年化基差率: {fmt(indicators['年化基差率(%)'], 2, '%')} (主力合约剩余{fmt(indicators['主力剩余天数'], 0)}天)
+年化波动率(近{INDICATOR_VOLATILITY_WINDOW}日): {fmt(indicators['年化波动率(%)'], 1, '%')}
+"""
+        else:
+            summary += "衍生指标数据不足\n"
+        
         summary += f"""
 ================================
 【数据统计】
@@ -370,28 +1513,429 @@ class FutureDataAnalyzer:
         else:
             return "🔵 合理区间：可持有或按原计划操作"
 
-# ========== GUI主程序模块 ==========
-class FutureAnalysisApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("期货价格分析系统")
-        
-        # 初始化模块
-        self.fetcher = FutureDataFetcher()
-        self.analyzer = FutureDataAnalyzer()
+# ========== 衍生指标模块 ==========
+INDICATOR_ZSCORE_WINDOW = 60       # 基差Z分数的滚动窗口（交易日）
+INDICATOR_VOLATILITY_WINDOW = 20   # 波动率的滚动窗口（交易日）
+TRADING_DAYS_PER_YEAR = 250
+INDICATOR_COLUMNS = ["期限价差", "期限价差率(%)", "基差", "基差Z分数", "主力剩余天数", "年化基差率(%)", "年化波动率(%)"]
+
+def contract_expiry_dates(codes, trade_dates):
+    """
+    由合约代码（如cu2406、铜2406、CF409）估算到期日（交割月15日）
+    四位数字为年月（YYMM）；郑商所三位数字只有年份个位，取交易日期之后最近的年份
+    """
+    codes = pd.Series(codes).reset_index(drop=True)
+    if not isinstance(codes.dtype, pd.CategoricalDtype):
+        codes = codes.astype(object).astype(str)
+    # 分类类型的合约代码只需对不重复的代码做一次正则提取
+    digits = codes.str.extract(r"(\d{3,4})\s*$")[0]
+    trade_dates = pd.DatetimeIndex(trade_dates)
+    month = pd.to_numeric(digits.str[-2:], errors="coerce").to_numpy()
+    year_digits = digits.str[:-2]
+    
+    year = pd.to_numeric(year_digits, errors="coerce").to_numpy()
+    is_short = (year_digits.str.len() == 1).to_numpy()
+    trade_year = trade_dates.year.to_numpy()
+    # 两位年份：2000年之后；一位年份：交易日期所在年代，早于交易年份时进入下一个年代
+    year = np.where(is_short, trade_year - trade_year % 10 + year, 2000 + year)
+    year = np.where(is_short & (year < trade_year), year + 10, year)
+    
+    valid = ~np.isnan(year) & ~np.isnan(month) & (month >= 1) & (month <= 12)
+    expiry = pd.to_datetime({"year": np.where(valid, year, 2000), "month": np.where(valid, month, 1), "day": 15})
+    return expiry.where(valid)
+
+def compute_future_indicators(data, zscore_window=INDICATOR_ZSCORE_WINDOW,
+                              volatility_window=INDICATOR_VOLATILITY_WINDOW):
+    """
+    一次性计算所有商品的衍生指标，返回按(商品, 日期)排序的长表：
+    期限价差 = 最近合约价格 - 主力合约价格（正值为近高远低的反向市场）
+    基差Z分数 = 基差相对其滚动均值的标准化偏离
+    年化基差率 = 基差 / 主力合约价格 × 365 / 主力合约剩余天数
+    年化波动率 = 主力合约价格对数收益率的滚动标准差 × √250
+    """
+    columns = ["商品", "日期"] + INDICATOR_COLUMNS
+    if data is None or data.empty or "主力合约价格" not in data.columns:
+        return pd.DataFrame(columns=columns)
+    
+    source_columns = [c for c in ["商品", "日期", "现货价格", "最近合约价格", "主力合约价格", "主力合约代码"]
+                      if c in data.columns]
+    frame = data.loc[data["商品"].notna(), source_columns].sort_values(["商品", "日期"], kind="mergesort")
+    frame = frame.reset_index(drop=True)
+    main_price = frame["主力合约价格"].astype(float)
+    result = frame[["商品", "日期"]].copy()
+    
+    # 期限结构：近月合约相对主力合约
+    if "最近合约价格" in frame.columns:
+        result["期限价差"] = frame["最近合约价格"].astype(float) - main_price
+        result["期限价差率(%)"] = result["期限价差"] / main_price * 100
+    else:
+        result["期限价差"] = np.nan
+        result["期限价差率(%)"] = np.nan
+    
+    # 基差及其滚动Z分数
+    basis = frame["现货价格"].astype(float) - main_price if "现货价格" in frame.columns else main_price * np.nan
+    result["基差"] = basis
+    products = frame["商品"]
+    min_periods = max(2, zscore_window // 2)
+    rolling_basis = basis.groupby(products, sort=False, observed=True).rolling(zscore_window, min_periods=min_periods)
+    basis_mean = rolling_basis.mean().reset_index(level=0, drop=True)
+    basis_std = rolling_basis.std().reset_index(level=0, drop=True)
+    result["基差Z分数"] = (basis - basis_mean) / basis_std.where(basis_std > 0)
+    
+    # 年化基差率：按主力合约剩余天数折算
+    if "主力合约代码" in frame.columns:
+        expiry = contract_expiry_dates(frame["主力合约代码"], frame["日期"])
+        days = (expiry - pd.DatetimeIndex(frame["日期"])).dt.days
+        result["主力剩余天数"] = days.where(days > 0)
+    else:
+        result["主力剩余天数"] = np.nan
+    result["年化基差率(%)"] = basis / main_price * 365 / result["主力剩余天数"] * 100
+    
+    # 年化波动率：对数收益率的滚动标准差
+    log_price = np.log(main_price.where(main_price > 0))
+    returns = log_price.groupby(products, sort=False, observed=True).diff()
+    volatility = returns.groupby(products, sort=False, observed=True).rolling(
+        volatility_window, min_periods=max(2, volatility_window // 2)).std().reset_index(level=0, drop=True)
+    result["年化波动率(%)"] = volatility * math.sqrt(TRADING_DAYS_PER_YEAR) * 100
+    
+    return result[columns]
+
+
+# ========== 预警规则模块 ==========
+# 规则表达式中可用的变量名 -> 扫描结果中的列
+ALERT_COLUMN_ALIASES = {
+    "price": "当前价格",
+    "percentile": "百分位",
+    "mean": "历史均值",
+    "std": "历史标准差",
+    "data_points": "数据点数",
+    "term_spread": "期限价差",
+    "term_spread_pct": "期限价差率(%)",
+    "basis": "基差",
+    "basis_z": "基差Z分数",
+    "days_to_expiry": "主力剩余天数",
+    "annual_basis": "年化基差率(%)",
+    "volatility": "年化波动率(%)",
+}
+
+DEFAULT_ALERT_RULES = [
+    {"name": "极端高估", "condition": "percentile >= 99", "level": "warning"},
+    {"name": "极端低估", "condition": "percentile <= 1", "level": "warning"},
+    {"name": "高位且基差深度贴水", "condition": "percentile > 95 and basis_z < -2", "level": "critical"},
+    {"name": "低位且基差大幅升水", "condition": "percentile < 5 and basis_z > 2", "level": "critical"},
+    {"name": "波动率异常", "condition": "volatility > 60", "level": "info"},
+]
+
+def desktop_notify(title, message):
+    """发送桌面通知（有plyer时使用plyer，否则尝试系统命令），无法通知时返回False"""
+    try:
+        from plyer import notification
+        notification.notify(title=title, message=message[:250], app_name="期货价格分析系统", timeout=10)
+        return True
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"桌面通知失败: {e}")
+        return False
+    
+    try:
+        if platform.system() == "Darwin":
+            script = f'display notification {json.dumps(message)} with title {json.dumps(title)}'
+            subprocess.run(["osascript", "-e", script], timeout=5, check=False)
+            return True
+        if platform.system() == "Linux" and shutil.which("notify-send"):
+            subprocess.run(["notify-send", title, message], timeout=5, check=False)
+            return True
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"桌面通知失败: {e}")
+    return False
+
+class AlertRuleEngine:
+    """
+    声明式预警规则：每条规则是一个作用于全部商品的表达式（如 "percentile > 95 and basis_z < -2"），
+    对扫描结果整表向量化求值；新触发的预警追加到CSV日志，可选发送桌面通知
+    
+    规则文件（JSON）可以是规则列表，也可以是 {"desktop_notify": true, "rules": [...]}，
+    每条规则包含 name、condition，可选 level 和 enabled
+    """
+    LOG_COLUMNS = ["触发时间", "规则", "级别", "商品", "数据日期", "当前价格", "百分位", "条件"]
+    
+    def __init__(self, rules_path=None, log_path=None, desktop_notify=False):
+        base_dir = os.path.join(os.path.expanduser("~"), ".futures_analysis")
+        self.rules_path = rules_path or os.path.join(base_dir, "alert_rules.json")
+        self.log_path = log_path or os.path.join(base_dir, "alerts.csv")
+        self.desktop_notify = desktop_notify
+        self.rules = [dict(rule) for rule in DEFAULT_ALERT_RULES]
+        self.rule_errors = {}
+        # 已触发过的(规则, 商品, 数据日期)，同一数据重复求值时不重复预警；第一次求值时从日志恢复，重启程序后仍然有效
+        # （读取日志需要pandas，放在求值时读取，图形界面启动时不触发pandas的延迟导入）
+        self._seen = None
+        self.load_rules()
+    
+    def load_rules(self):
+        """读取规则文件（不存在时使用默认规则）"""
+        if not os.path.exists(self.rules_path):
+            return
         
-        # 初始化变量
-        self.data = None
-        self.current_product = None
-        self.figure = None
-        self.canvas = None
-        self.toolbar = None
-        self.chart_frame = None
-        self.canvas_frame = None
-        self.hint_label = None  # 新增：用于保存提示标签的引用
+        try:
+            with open(self.rules_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取预警规则失败，使用默认规则: {e}")
+            return
         
-        # 设置Tkinter中文字体
-        self.set_tk_fonts()
+        if isinstance(config, dict):
+            self.desktop_notify = bool(config.get("desktop_notify", self.desktop_notify))
+            config = config.get("rules", [])
+        rules = [rule for rule in config if isinstance(rule, dict) and rule.get("name") and rule.get("condition")]
+        if len(rules) < len(config):
+            print(f"预警规则文件中有{len(config) - len(rules)}条规则缺少name或condition，已忽略")
+        self.rules = rules
+    
+    @staticmethod
+    def alert_keys(alerts):
+        """预警的去重键 (规则, 商品, 数据日期YYYY-MM-DD)，日志读回的字符串日期与扫描结果的日期格式一致"""
+        dates = pd.to_datetime(alerts["数据日期"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+        return list(zip(alerts["规则"].astype(str), alerts["商品"].astype(str), dates))
+    
+    def load_seen(self):
+        """从预警日志恢复已触发过的预警"""
+        self._seen = set()
+        if not os.path.exists(self.log_path):
+            return
+        try:
+            log = pd.read_csv(self.log_path, usecols=["规则", "商品", "数据日期"], dtype=str, encoding="utf-8-sig")
+        except (OSError, ValueError) as e:
+            print(f"读取预警日志失败，已触发的预警可能重复记录: {e}")
+            return
+        self._seen.update(self.alert_keys(log))
+    
+    @staticmethod
+    def build_frame(scan, indicators=None):
+        """合并价格扫描和衍生指标，列名换成规则中使用的英文变量名"""
+        frame = scan
+        if indicators is not None and not indicators.empty:
+            extra = indicators.drop(columns=["最新日期"], errors="ignore")
+            frame = scan.merge(extra, on="商品", how="left")
+        
+        frame = frame.rename(columns={column: alias for alias, column in ALERT_COLUMN_ALIASES.items()})
+        for alias in ALERT_COLUMN_ALIASES:
+            if alias not in frame.columns:
+                frame[alias] = np.nan
+        return frame
+    
+    def evaluate(self, frame):
+        """对全部商品求值所有启用的规则，返回全部匹配（不去重）"""
+        matches = []
+        self.rule_errors = {}
+        for rule in self.rules:
+            if not rule.get("enabled", True):
+                continue
+            try:
+                mask = frame.eval(rule["condition"])
+                mask = pd.Series(mask, index=frame.index).fillna(False).astype(bool)
+            except Exception as e:
+                self.rule_errors[rule["name"]] = str(e)
+                continue
+            
+            hits = frame.loc[mask]
+            if hits.empty:
+                continue
+            matches.append(pd.DataFrame({
+                "规则": rule["name"],
+                "级别": rule.get("level", "warning"),
+                "商品": hits["商品"].astype(object).to_numpy(),
+                "数据日期": hits["最新日期"].to_numpy() if "最新日期" in hits.columns else pd.NaT,
+                "当前价格": hits["price"].to_numpy(),
+                "百分位": hits["percentile"].to_numpy(),
+                "条件": rule["condition"],
+            }))
+        
+        if not matches:
+            return pd.DataFrame(columns=self.LOG_COLUMNS)
+        result = pd.concat(matches, ignore_index=True)
+        result.insert(0, "触发时间", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        return result
+    
+    def run(self, scan, indicators=None):
+        """求值规则，记录并通知新触发的预警，返回新预警"""
+        matches = self.evaluate(self.build_frame(scan, indicators))
+        if matches.empty:
+            return matches
+        
+        if self._seen is None:
+            self.load_seen()
+        keys = self.alert_keys(matches)
+        is_new = np.array([key not in self._seen for key in keys], dtype=bool)
+        self._seen.update(keys)
+        new_alerts = matches.loc[is_new].reset_index(drop=True)
+        if new_alerts.empty:
+            return new_alerts
+        
+        self.write_log(new_alerts)
+        if self.desktop_notify:
+            desktop_notify(f"期货预警：{len(new_alerts)}条", self.describe(new_alerts, limit=5))
+        return new_alerts
+    
+    def write_log(self, alerts):
+        """追加到CSV日志"""
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            write_header = not os.path.exists(self.log_path)
+            alerts[self.LOG_COLUMNS].to_csv(self.log_path, mode="a", header=write_header, index=False,
+                                            encoding="utf-8-sig" if write_header else "utf-8")
+        except OSError as e:
+            print(f"写入预警日志失败: {e}")
+    
+    @staticmethod
+    def describe(alerts, limit=None):
+        """预警的文字说明（每条一行）"""
+        rows = alerts if limit is None else alerts.head(limit)
+        lines = [f"[{row.规则}] {row.商品}: 价格{row.当前价格:.2f}，百分位{row.百分位:.1f}%"
+                 for row in rows.itertuples(index=False)]
+        if limit is not None and len(alerts) > limit:
+            lines.append(f"……共{len(alerts)}条")
+        return "\n".join(lines)
+
+
+# ========== 图表降采样 ==========
+def downsample_minmax(x, y, max_points):
+    """最小-最大值降采样：按顺序分桶，每桶保留最小值和最大值点，保证峰谷不丢失"""
+    n = len(x)
+    if n <= max_points or max_points < 4:
+        return x, y
+    
+    bucket_count = max_points // 2
+    edges = np.linspace(0, n, bucket_count + 1).astype(np.int64)
+    buckets = np.repeat(np.arange(bucket_count), np.diff(edges))
+    
+    # 按(桶, 值)排序后，每个桶的第一个是最小值、最后一个是最大值
+    order = np.lexsort((y, buckets))
+    starts = edges[:-1]
+    ends = edges[1:] - 1
+    keep = np.concatenate([order[starts], order[ends], [0, n - 1]])
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+def visible_slice(x, x_min, x_max):
+    """返回已排序x中落在可视范围内的切片（两侧各多保留一个点，保证线段连续）"""
+    start = max(int(np.searchsorted(x, x_min, side="left")) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, side="right")) + 1, len(x))
+    return slice(start, stop)
+
+
+# ========== GUI主程序模块 ==========
+class AnalysisJob:
+    """后台分析任务：取消后不再开始执行，已在执行的结果也会被丢弃"""
+    
+    def __init__(self, kind):
+        self.kind = kind
+        self.future = None
+        self._cancelled = threading.Event()
+    
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+    
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+class AnalysisWorker:
+    """单线程分析执行器：分析任务在后台线程中依次执行，结果通过root.after交回Tk主线程
+    
+    每类任务（kind）同时只保留最新的一个，提交新任务会取消同类的旧任务。
+    """
+    
+    def __init__(self, root):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+        self.jobs = {}  # kind -> 最新的AnalysisJob（只在Tk主线程中访问）
+    
+    def submit(self, kind, func, on_done, on_error=None):
+        """提交任务：func在后台线程执行，on_done(result)/on_error(exception)在Tk主线程执行"""
+        self.cancel(kind)
+        job = AnalysisJob(kind)
+        self.jobs[kind] = job
+        
+        def run():
+            if job.cancelled:
+                return
+            try:
+                result = func()
+            except Exception as e:
+                if on_error is not None:
+                    self.root.after(0, self._finish, job, on_error, e)
+                else:
+                    print(f"后台分析任务失败: {e}")
+                return
+            self.root.after(0, self._finish, job, on_done, result)
+        
+        job.future = self.executor.submit(run)
+        return job
+    
+    def _finish(self, job, callback, value):
+        """在Tk主线程中交付结果，已取消或已被新任务替换的结果直接丢弃"""
+        if job.cancelled or self.jobs.get(job.kind) is not job:
+            return
+        del self.jobs[job.kind]
+        callback(value)
+    
+    def cancel(self, kind=None):
+        """取消指定类型的任务，kind为None时取消全部任务"""
+        kinds = list(self.jobs) if kind is None else [kind]
+        for k in kinds:
+            job = self.jobs.pop(k, None)
+            if job is not None:
+                job.cancel()
+    
+    def is_busy(self, kind):
+        return kind in self.jobs
+    
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False)
+
+
+class FutureAnalysisApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("期货价格分析系统")
+        
+        # 初始化模块（数据获取器依赖requests，在后台导入完成后创建，见finish_startup）
+        self.fetcher = None
+        try:
+            self.store = FutureDataStore()
+        except OSError as e:
+            print(f"无法创建本地数据库目录: {e}")
+            self.store = None
+        self.analyzer = FutureDataAnalyzer()
+        # 预警规则（~/.futures_analysis/alert_rules.json），每次数据刷新后求值
+        self.alert_engine = AlertRuleEngine()
+        # 分析器只在后台分析线程中使用，避免读取/分析大数据时阻塞界面
+        self.analysis_worker = AnalysisWorker(root)
+        
+        # 初始化变量
+        self.data = None
+        self.current_product = None
+        self.figure = None
+        self.canvas = None
+        self.toolbar = None
+        self.chart_frame = None
+        self.canvas_frame = None
+        self.hint_label = None  # 新增：用于保存提示标签的引用
+        self.chart_artists = None  # 分析图表的可复用图元（首次分析时创建）
+        self.dashboard = None  # 多商品对比窗口的控件和图表
+        # 实时行情：行情源使用数据获取器的会话（共享连接池），在finish_startup中创建
+        self.quote_provider = None
+        self.quote_poller = None
+        self.quote_positions = {}  # 商品 -> 最新实时价格的百分位分析
+        self.chart_product = None  # 当前图表显示的商品
+        
+        # 设置Tkinter中文字体
+        self.set_tk_fonts()
         
         # 设置窗口大小和最小尺寸
         self.root.geometry("1200x800")
@@ -462,7 +2006,11 @@ class FutureAnalysisApp:
         
         # 读取CSV数据按钮
         self.load_csv_btn = ttk.Button(date_frame, text="读取CSV数据", command=self.load_csv_data)
-        self.load_csv_btn.pack(side=tk.LEFT)
+        self.load_csv_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 读取本地数据库按钮
+        self.load_store_btn = ttk.Button(date_frame, text="读取本地数据库", command=self.load_store_data)
+        self.load_store_btn.pack(side=tk.LEFT)
         
         # 进度条
         self.progress_var = tk.DoubleVar()
@@ -486,6 +2034,8 @@ class FutureAnalysisApp:
         self.product_combo = ttk.Combobox(analysis_controls_frame, textvariable=self.product_var, 
                                          state="readonly", width=25)
         self.product_combo.pack(side=tk.LEFT, padx=(0, 15))
+        # 选择商品后自动分析（新的选择会取消尚未完成的分析）
+        self.product_combo.bind("<<ComboboxSelected>>", self.on_product_selected)
         
         # 分析按钮
         self.analyze_btn = ttk.Button(analysis_controls_frame, text="分析价格位置", 
@@ -502,11 +2052,26 @@ class FutureAnalysisApp:
                                            command=self.quick_scan_all_products, state=tk.DISABLED)
         self.quick_analysis_btn.pack(side=tk.LEFT, padx=(0, 5))
         
+        # 多商品对比按钮
+        self.dashboard_btn = ttk.Button(analysis_controls_frame, text="多商品对比", 
+                                       command=self.open_dashboard, state=tk.DISABLED)
+        self.dashboard_btn.pack(side=tk.LEFT, padx=(0, 5))
+        
         # 清空数据按钮
         self.clear_data_btn = ttk.Button(analysis_controls_frame, text="清空数据", 
                                         command=self.clear_data, state=tk.DISABLED)
         self.clear_data_btn.pack(side=tk.LEFT)
         
+        # 实时行情：按间隔轮询最新价，并计算其在历史价格中的百分位
+        quote_frame = ttk.Frame(analysis_frame)
+        quote_frame.pack(fill=tk.X, pady=(5, 0))
+        self.quote_var = tk.BooleanVar(value=False)
+        self.quote_check = ttk.Checkbutton(quote_frame, text=f"实时行情（每{self.QUOTE_INTERVAL}秒，{SinaFuturesQuoteProvider.name}）",
+                                          variable=self.quote_var, command=self.toggle_quotes, state=tk.DISABLED)
+        self.quote_check.pack(side=tk.LEFT, padx=(0, 10))
+        self.quote_label = ttk.Label(quote_frame, text="")
+        self.quote_label.pack(side=tk.LEFT)
+        
         # ========== 结果显示区域 ==========
         result_frame = ttk.LabelFrame(main_frame, text="价格分析结果", padding="10")
         result_frame.pack(fill=tk.BOTH, expand=False, pady=(0, 10))
@@ -550,11 +2115,43 @@ class FutureAnalysisApp:
         self.window_size_label = ttk.Label(status_frame, text="")
         self.window_size_label.pack(side=tk.RIGHT, padx=5)
         
-        # 初始创建图表
-        self.create_initial_chart()
-        
         # 更新窗口大小标签
         self.update_window_size_label()
+        
+        # 窗口先显示出来，数据处理和绘图模块在后台导入，完成后再创建图表
+        self.start_background_preload()
+    
+    def start_background_preload(self):
+        """在后台线程中导入numpy/pandas/requests/lxml/matplotlib，导入期间禁用数据读取按钮"""
+        self.startup_time = time.perf_counter()
+        self.loading_label = ttk.Label(self.inner_chart_frame, text="正在加载数据处理和绘图组件...",
+                                       font=('Microsoft YaHei', 12))
+        self.loading_label.pack(side=tk.TOP, pady=50)
+        self.status_label.config(text="正在加载组件...")
+        for button in (self.fetch_btn, self.load_csv_btn, self.load_store_btn):
+            button.config(state=tk.DISABLED)
+        
+        def preload():
+            try:
+                # matplotlib只预先导入与界面无关的部分，TkAgg后端在主线程中加载
+                preload_modules(extra=("matplotlib", "matplotlib.figure", "matplotlib.dates"))
+            except Exception as e:
+                print(f"后台加载组件失败: {e}")
+            self.root.after(0, self.finish_startup)
+        
+        threading.Thread(target=preload, daemon=True).start()
+    
+    def finish_startup(self):
+        """后台导入完成：加载TkAgg后端，创建数据获取器、行情源和初始图表"""
+        load_gui_modules()
+        self.fetcher = create_default_fetcher()
+        self.quote_provider = SinaFuturesQuoteProvider(session=self.fetcher.session)
+        
+        self.loading_label.destroy()
+        self.create_initial_chart()
+        for button in (self.fetch_btn, self.load_csv_btn, self.load_store_btn):
+            button.config(state=tk.NORMAL)
+        self.status_label.config(text=f"就绪（组件加载耗时{time.perf_counter() - self.startup_time:.1f}秒）")
     
     def create_scrollable_chart_area(self):
         """创建可滚动的图表区域"""
@@ -642,23 +2239,27 @@ class FutureAnalysisApp:
                 self.chart_canvas.xview_scroll(1, "units")
     
     def create_initial_chart(self):
-        """创建初始的空白图表"""
-        # 清除inner_chart_frame中的所有组件
-        for widget in self.inner_chart_frame.winfo_children():
-            widget.destroy()
-        
-        # 清除现有图表
-        if self.figure is not None:
-            plt.close(self.figure)
-            self.figure = None
-        
+        """显示初始的空白图表（图表和画布只创建一次，之后复用）"""
         # 清除提示标签
         if self.hint_label is not None:
             self.hint_label.destroy()
             self.hint_label = None
         
-        # 创建新的图表 - 使用更大的尺寸
-        self.figure, self.ax = plt.subplots(figsize=(14, 8))
+        if self.figure is None:
+            # 创建图表 - 使用更大的尺寸
+            self.figure = plt.figure(figsize=(14, 8))
+            self.canvas = FigureCanvasTkAgg(self.figure, master=self.inner_chart_frame)
+            self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=5, pady=5)
+            
+            # 添加matplotlib工具栏
+            self.create_matplotlib_toolbar()
+        else:
+            self.figure.clf()
+        
+        # 分析图表的图元已被清除，下次分析时重新创建
+        self.chart_artists = None
+        
+        self.ax = self.figure.add_subplot(111)
         self.ax.set_title("请先获取数据并选择商品进行分析", fontsize=14)
         self.ax.set_xlabel("日期")
         self.ax.set_ylabel("价格")
@@ -671,13 +2272,9 @@ class FutureAnalysisApp:
                     transform=self.ax.transAxes, fontsize=12, 
                     bbox=dict(boxstyle="round,pad=0.5", facecolor="lightblue", alpha=0.5))
         
-        # 创建并显示空白图表
-        self.canvas = FigureCanvasTkAgg(self.figure, master=self.inner_chart_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        # 添加matplotlib工具栏
-        self.create_matplotlib_toolbar()
+        self.canvas.draw_idle()
+        if self.toolbar is not None:
+            self.toolbar.update()
         
         # 更新滚动区域
         self.update_chart_scrollregion()
@@ -727,6 +2324,14 @@ class FutureAnalysisApp:
             # 获取数据
             data = self.fetcher.get_future_data(start_date, end_date, progress_callback)
             
+            # 追加到本地数据库
+            if self.store is not None and data is not None and not data.empty:
+                progress_callback(100, "正在写入本地数据库...")
+                try:
+                    self.store.append(data)
+                except Exception as e:
+                    print(f"写入本地数据库失败: {e}")
+            
             # 在主线程中处理结果
             self.root.after(0, self.handle_fetch_result, data)
         except Exception as e:
@@ -742,29 +2347,34 @@ class FutureAnalysisApp:
         self.fetch_btn.config(state=tk.NORMAL)
         
         if data is not None and not data.empty:
-            self.data = data
-            self.analyzer.set_data(data)
-            
-            # 更新商品列表
-            products = self.analyzer.get_available_products()
-            self.product_combo['values'] = products
-            if products:
-                self.product_var.set(products[0])
-            
-            # 启用分析按钮
-            self.analyze_btn.config(state=tk.NORMAL)
-            self.save_btn.config(state=tk.NORMAL)
-            self.quick_analysis_btn.config(state=tk.NORMAL)
-            self.clear_data_btn.config(state=tk.NORMAL)
-            
-            # 显示数据摘要
-            self.show_data_summary()
-            
-            self.status_label.config(text=f"数据获取成功，共{len(data)}条记录，{len(products)}个商品")
-            messagebox.showinfo("成功", f"数据获取成功！\n共获取{len(data)}条记录，{len(products)}个商品")
+            # 新获取的交易日追加到已读取的历史数据中，而不是替换
+            self.load_data_async(lambda: data, lambda merged, products: self.on_fetched_data_loaded(data, merged, products),
+                                 "正在合并数据...", append=True)
         else:
             self.status_label.config(text="数据获取失败或未获取到数据")
-            messagebox.showwarning("警告", "未获取到数据，请检查日期或网络连接")
+            message = "未获取到数据，请检查日期或网络连接"
+            if self.fetcher.last_failed_dates:
+                message += f"\n\n{self.failed_dates_message()}"
+            messagebox.showwarning("警告", message)
+    
+    def on_fetched_data_loaded(self, fetched, data, products):
+        """网络获取的数据已合并到现有数据中"""
+        stats = self.fetcher.last_fetch_stats
+        self.status_label.config(text=f"数据获取成功，获取{len(fetched)}条记录，合并后共{len(data)}条，{len(products)}个商品"
+                                      f"（缓存{stats['cached']}天，网络获取{stats['fetched']}天，"
+                                      f"跳过非交易日{stats['skipped']}天，失败{stats['failed']}天）")
+        message = f"数据获取成功！\n共获取{len(fetched)}条记录，合并后共{len(data)}条记录，{len(products)}个商品"
+        if self.fetcher.last_failed_dates:
+            message += f"\n\n{self.failed_dates_message()}"
+            messagebox.showwarning("部分日期获取失败", message)
+        else:
+            messagebox.showinfo("成功", message)
+    
+    def failed_dates_message(self):
+        """网络错误导致获取失败的日期说明（不同于无数据的非交易日）"""
+        failed = self.fetcher.last_failed_dates
+        shown = "、".join(failed[:10]) + (f" 等{len(failed)}天" if len(failed) > 10 else "")
+        return f"以下日期因网络错误获取失败（重试后仍失败），可稍后重新获取：\n{shown}"
     
     def handle_fetch_error(self, error_msg):
         """处理获取数据时的错误"""
@@ -772,65 +2382,172 @@ class FutureAnalysisApp:
         self.status_label.config(text=f"数据获取失败: {error_msg}")
         messagebox.showerror("错误", f"获取数据时发生错误:\n{error_msg}")
     
+    def load_data_async(self, load_func, on_loaded, message, on_error=None, append=False):
+        """在后台线程中读取数据并建立分析索引，完成后在主线程中刷新界面
+        
+        load_func在后台线程中执行并返回DataFrame；on_loaded(data, products)和on_error(exception)在主线程中执行，
+        未读取到数据时data为None，此时保留原有数据。append为True时把读取的数据追加到已有数据中
+        （跳过已有的商品和日期，只更新涉及商品的索引和百分位跟踪器），on_loaded收到的是合并后的数据。
+        """
+        # 旧数据上的分析、扫描和实时行情已无意义
+        self.analysis_worker.cancel()
+        self.close_dashboard()
+        if self.quote_poller is not None:
+            self.quote_var.set(False)
+            self.toggle_quotes()
+        self.progress_label.config(text=message)
+        self.set_loading_state(True)
+        
+        def job():
+            data = load_func()
+            if data is None or data.empty:
+                return None, []
+            if append:
+                self.analyzer.append_data(data)
+            else:
+                self.analyzer.set_data(data)
+            return self.analyzer.data, self.analyzer.get_available_products()
+        
+        def done(result):
+            data, products = result
+            self.set_loading_state(False)
+            if data is not None:
+                self.apply_loaded_data(data, products)
+            on_loaded(data, products)
+            if data is not None:
+                self.run_alerts()
+        
+        def failed(error):
+            self.set_loading_state(False)
+            self.progress_label.config(text="数据加载失败")
+            if on_error is not None:
+                on_error(error)
+        
+        self.analysis_worker.submit("data", job, done, failed)
+    
+    def set_loading_state(self, loading):
+        """读取数据期间禁用读取和分析按钮"""
+        load_state = tk.DISABLED if loading else tk.NORMAL
+        self.load_csv_btn.config(state=load_state)
+        self.load_store_btn.config(state=load_state)
+        
+        data_state = tk.DISABLED if loading or self.data is None else tk.NORMAL
+        self.analyze_btn.config(state=data_state)
+        self.save_btn.config(state=data_state)
+        self.quick_analysis_btn.config(state=data_state)
+        self.dashboard_btn.config(state=data_state)
+        self.quote_check.config(state=data_state)
+        self.clear_data_btn.config(state=data_state)
+    
+    def apply_loaded_data(self, data, products):
+        """数据读取并索引完成后更新界面"""
+        self.data = data
+        
+        # 更新商品列表
+        self.product_combo['values'] = products
+        if products:
+            self.product_var.set(products[0])
+        
+        # 启用分析按钮
+        self.analyze_btn.config(state=tk.NORMAL)
+        self.save_btn.config(state=tk.NORMAL)
+        self.quick_analysis_btn.config(state=tk.NORMAL)
+        self.dashboard_btn.config(state=tk.NORMAL)
+        self.quote_check.config(state=tk.NORMAL)
+        self.clear_data_btn.config(state=tk.NORMAL)
+        
+        # 显示数据摘要
+        self.show_data_summary()
+        self.progress_label.config(text="就绪")
+    
+    def run_alerts(self):
+        """数据刷新后在后台线程中对全部商品求值预警规则，新触发的预警显示在结果区并写入日志"""
+        def job():
+            return self.alert_engine.run(self.analyzer.batch_scan(), self.analyzer.indicator_scan())
+        
+        def done(alerts):
+            errors = self.alert_engine.rule_errors
+            if errors:
+                self.result_text.insert(tk.END, "\n【预警规则错误】\n" +
+                                        "\n".join(f"{name}: {error}" for name, error in errors.items()) + "\n")
+            if alerts.empty:
+                return
+            self.result_text.insert(tk.END, f"\n【预警】触发{len(alerts)}条（已记录到{self.alert_engine.log_path}）\n"
+                                    + self.alert_engine.describe(alerts) + "\n")
+            self.status_label.config(text=f"{self.status_label.cget('text')}；触发{len(alerts)}条预警")
+        
+        self.analysis_worker.submit("alerts", job, done, lambda e: print(f"预警规则求值失败: {e}"))
+    
     def load_csv_data(self):
-        """读取CSV文件数据"""
+        """读取CSV文件数据（在后台线程中读取）"""
         file_path = filedialog.askopenfilename(
             title="选择CSV数据文件",
-            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")],
+            filetypes=[("CSV文件", "*.csv"), ("Parquet文件", "*.parquet"), ("所有文件", "*.*")],
             initialdir="."  # 初始目录为当前目录
         )
         
         if not file_path:
             return  # 用户取消了选择
         
-        try:
-            # 显示加载状态
-            self.progress_label.config(text="正在加载CSV数据...")
-            self.root.update()
-            
-            # 读取CSV文件
-            data = pd.read_csv(file_path, encoding='utf-8-sig')
+        def read_file():
+            # 读取CSV或Parquet文件
+            if file_path.lower().endswith(".parquet"):
+                data = pd.read_parquet(file_path)
+            else:
+                data = pd.read_csv(file_path, encoding='utf-8-sig')
             
             # 检查必要列是否存在
             required_columns = ["商品", "日期"]
             missing_columns = [col for col in required_columns if col not in data.columns]
-            
             if missing_columns:
-                messagebox.showerror("错误", f"CSV文件缺少必要列: {', '.join(missing_columns)}")
-                self.progress_label.config(text="CSV文件加载失败")
+                raise ValueError(f"CSV文件缺少必要列: {', '.join(missing_columns)}")
+            return data
+        
+        def loaded(data, products):
+            if data is None:
+                self.status_label.config(text="CSV文件中没有数据")
+                messagebox.showwarning("警告", "CSV文件中没有数据")
                 return
-            
-            # 处理数据
-            self.data = data
-            self.analyzer.set_data(data)
-            
-            # 更新商品列表
-            products = self.analyzer.get_available_products()
-            self.product_combo['values'] = products
-            if products:
-                self.product_var.set(products[0])
-            
-            # 启用分析按钮
-            self.analyze_btn.config(state=tk.NORMAL)
-            self.save_btn.config(state=tk.NORMAL)
-            self.quick_analysis_btn.config(state=tk.NORMAL)
-            self.clear_data_btn.config(state=tk.NORMAL)
-            
-            # 显示数据摘要
-            self.show_data_summary()
-            
             self.status_label.config(text=f"CSV数据加载成功，共{len(data)}条记录，{len(products)}个商品")
             messagebox.showinfo("成功", f"CSV数据加载成功！\n文件: {os.path.basename(file_path)}\n共{len(data)}条记录，{len(products)}个商品")
-            
-        except Exception as e:
+        
+        def failed(e):
             self.status_label.config(text=f"CSV数据加载失败: {str(e)}")
             messagebox.showerror("错误", f"加载CSV文件时发生错误:\n{str(e)}")
+        
+        self.load_data_async(read_file, loaded, "正在加载CSV数据...", failed)
+    
+    def load_store_data(self):
+        """读取本地数据库中的全部历史数据（在后台线程中读取）"""
+        if self.store is None:
+            messagebox.showerror("错误", "本地数据库不可用")
+            return
+        
+        def loaded(data, products):
+            if data is None:
+                self.progress_label.config(text="本地数据库为空")
+                messagebox.showwarning("警告", "本地数据库中没有数据，请先获取期货数据")
+                return
+            self.progress_label.config(text="本地数据库读取完成")
+            self.status_label.config(text=f"本地数据库读取成功，共{len(data)}条记录，{len(products)}个商品")
+        
+        def failed(e):
+            if isinstance(e, ImportError):
+                messagebox.showerror("错误", f"读取Parquet需要安装pyarrow:\n{str(e)}")
+                return
+            self.status_label.config(text=f"本地数据库读取失败: {str(e)}")
+            messagebox.showerror("错误", f"读取本地数据库时发生错误:\n{str(e)}")
+        
+        self.load_data_async(self.store.load, loaded, "正在读取本地数据库...", failed)
     
     def clear_data(self):
         """清空当前数据"""
         if messagebox.askyesno("确认", "确定要清空当前数据吗？"):
+            self.quote_var.set(False)
+            self.toggle_quotes()
+            self.analysis_worker.cancel()
             self.data = None
-            self.analyzer.set_data(None)
+            self.analysis_worker.submit("data", lambda: self.analyzer.set_data(None), lambda _: None)
             
             # 清空商品列表
             self.product_combo['values'] = []
@@ -840,6 +2557,9 @@ class FutureAnalysisApp:
             self.analyze_btn.config(state=tk.DISABLED)
             self.save_btn.config(state=tk.DISABLED)
             self.quick_analysis_btn.config(state=tk.DISABLED)
+            self.dashboard_btn.config(state=tk.DISABLED)
+            self.quote_check.config(state=tk.DISABLED)
+            self.close_dashboard()
             self.clear_data_btn.config(state=tk.DISABLED)
             
             # 清空结果显示
@@ -865,7 +2585,7 @@ class FutureAnalysisApp:
 获取时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 数据日期范围: {self.data['日期'].min()} 至 {self.data['日期'].max()}
 总记录数: {len(self.data)}
-商品数量: {len(self.analyzer.get_available_products())}
+商品数量: {len(self.product_combo['values'])}
 """
             if "交易所" in self.data.columns:
                 summary += f"交易所列表: {', '.join(self.data['交易所'].dropna().unique())}\n"
@@ -878,8 +2598,13 @@ class FutureAnalysisApp:
             self.result_text.delete(1.0, tk.END)
             self.result_text.insert(1.0, summary)
     
+    def on_product_selected(self, event=None):
+        """下拉列表选择商品后自动分析"""
+        if self.data is not None and not self.analysis_worker.is_busy("data"):
+            self.analyze_selected_product()
+    
     def analyze_selected_product(self):
-        """分析选中的商品"""
+        """分析选中的商品（在后台线程中分析，新的分析会取消尚未完成的分析）"""
         product_name = self.product_var.get()
         if not product_name:
             messagebox.showwarning("警告", "请先选择要分析的商品")
@@ -888,29 +2613,78 @@ class FutureAnalysisApp:
         # 显示分析中状态
         self.result_text.delete(1.0, tk.END)
         self.result_text.insert(1.0, f"正在分析 {product_name}...")
-        self.root.update()
+        self.status_label.config(text=f"正在分析: {product_name}")
         
-        # 执行分析
-        summary, product_data, analysis_dict = self.analyzer.get_analysis_summary(product_name)
+        def done(result):
+            summary, product_data, analysis_dict = result
+            
+            # 显示分析结果
+            self.result_text.delete(1.0, tk.END)
+            self.result_text.insert(1.0, summary)
+            
+            # 更新图表
+            if product_data is not None and analysis_dict is not None:
+                self.update_chart(product_data, analysis_dict)
+            
+            # 更新状态
+            self.status_label.config(text=f"完成分析: {product_name}")
         
-        # 显示分析结果
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(1.0, summary)
+        def failed(e):
+            self.result_text.delete(1.0, tk.END)
+            self.status_label.config(text=f"分析失败: {str(e)}")
+            messagebox.showerror("错误", f"分析{product_name}时发生错误:\n{str(e)}")
         
-        # 更新图表
-        if product_data is not None and analysis_dict is not None:
-            self.update_chart(product_data, analysis_dict)
+        self.analysis_worker.submit("analyze", lambda: self.analyzer.get_analysis_summary(product_name), done, failed)
+    
+    @staticmethod
+    def format_scan_result(scan):
+        """把batch_scan的结果整理成文本，返回(文本, 高估商品数, 低估商品数)"""
+        # 根据百分位添加表情符号
+        percentile = scan["百分位"].to_numpy(dtype=float)
+        scan["表情"] = np.select([percentile >= 99, percentile >= 80, percentile <= 1, percentile <= 20],
+                               ["🔴", "🟠", "🟢", "🟡"], default="🔵")
+        scan.loc[scan["百分位"].isna(), "表情"] = "❓"
         
-        # 更新状态
-        self.status_label.config(text=f"完成分析: {product_name}")
+        # 按百分位降序排列（高估的在前）
+        with_percentile = scan[scan["百分位"].notna()].sort_values("百分位", ascending=False)
+        without_percentile = scan[scan["百分位"].isna()]
+        high_estimated = with_percentile[with_percentile["百分位"] >= 80]
+        low_estimated = with_percentile[with_percentile["百分位"] <= 20]
+        normal_estimated = with_percentile[(with_percentile["百分位"] > 20) & (with_percentile["百分位"] < 80)]
+        
+        # 汇总结果一次性写入
+        lines = [f"【快速扫描结果 - 共分析 {len(scan)} 个商品】\n", "【高估/极端高估商品】"]
+        if high_estimated.empty:
+            lines.append("暂无")
+        for row in high_estimated.itertuples(index=False):
+            lines.append(f"{row.表情} {row.商品}: {row.百分位:.1f}% - {row.状态}")
+        
+        lines.append("\n【低估/极端低估商品】")
+        if low_estimated.empty:
+            lines.append("暂无")
+        for row in low_estimated.itertuples(index=False):
+            lines.append(f"{row.表情} {row.商品}: {row.百分位:.1f}% - {row.状态}")
+        
+        lines.append("\n【合理区间商品】")
+        if normal_estimated.empty:
+            lines.append("暂无")
+        for row in normal_estimated.itertuples(index=False):
+            lines.append(f"{row.表情} {row.商品}: {row.百分位:.1f}%")
+        
+        if not without_percentile.empty:
+            lines.append(f"\n【数据不足商品 ({len(without_percentile)}个)】")
+            for row in without_percentile.itertuples(index=False):
+                lines.append(f"{row.表情} {row.商品}: {row.状态}")
+        
+        return "\n".join(lines) + "\n", len(high_estimated), len(low_estimated)
     
     def quick_scan_all_products(self):
-        """快速扫描所有商品"""
+        """快速扫描所有商品（在后台线程中扫描）"""
         if self.data is None or self.data.empty:
             messagebox.showwarning("警告", "请先获取数据")
             return
         
-        products = self.analyzer.get_available_products()
+        products = self.product_combo['values']
         if not products:
             messagebox.showwarning("警告", "没有可分析的商品")
             return
@@ -918,289 +2692,538 @@ class FutureAnalysisApp:
         # 显示扫描中状态
         self.result_text.delete(1.0, tk.END)
         self.result_text.insert(1.0, f"正在快速扫描 {len(products)} 个商品...\n\n")
-        self.root.update()
+        self.quick_analysis_btn.config(state=tk.DISABLED)
         
-        results = []
-        for i, product in enumerate(products):
-            self.result_text.insert(tk.END, f"分析 {product}...")
-            self.root.update()
-            
-            try:
-                _, _, analysis_dict = self.analyzer.get_analysis_summary(product)
-                future_info = analysis_dict.get("future", {})
-                
-                if "percentile" in future_info:
-                    status = future_info.get("status", "未知")
-                    color = future_info.get("color", "black")
-                    
-                    # 根据百分位添加表情符号
-                    percentile = future_info["percentile"]
-                    if percentile >= 99:
-                        emoji = "🔴"
-                    elif percentile >= 80:
-                        emoji = "🟠"
-                    elif percentile <= 1:
-                        emoji = "🟢"
-                    elif percentile <= 20:
-                        emoji = "🟡"
-                    else:
-                        emoji = "🔵"
-                    
-                    results.append((product, percentile, status, emoji))
-                    self.result_text.insert(tk.END, f" 完成 {emoji}\n")
-                else:
-                    results.append((product, None, "数据不足", "❓"))
-                    self.result_text.insert(tk.END, " 数据不足\n")
-            except Exception as e:
-                results.append((product, None, f"错误: {str(e)}", "❌"))
-                self.result_text.insert(tk.END, f" 错误\n")
+        def done(result):
+            text, high_count, low_count = result
+            self.quick_analysis_btn.config(state=tk.NORMAL)
+            self.result_text.delete(1.0, tk.END)
+            self.result_text.insert(1.0, text)
             
-            self.root.update()
+            # 更新状态
+            self.status_label.config(text=f"快速扫描完成，发现{high_count}个高估商品，{low_count}个低估商品")
         
-        # 按百分位排序
-        results_with_percentile = [(p, perc, status, emoji) for p, perc, status, emoji in results if perc is not None]
-        results_without_percentile = [(p, perc, status, emoji) for p, perc, status, emoji in results if perc is None]
+        def failed(e):
+            self.quick_analysis_btn.config(state=tk.NORMAL)
+            self.result_text.delete(1.0, tk.END)
+            self.status_label.config(text=f"快速扫描失败: {str(e)}")
+            messagebox.showerror("错误", f"快速扫描时发生错误:\n{str(e)}")
         
-        # 按百分位降序排列（高估的在前）
-        results_with_percentile.sort(key=lambda x: x[1], reverse=True)
+        self.analysis_worker.submit("scan", lambda: self.format_scan_result(self.analyzer.batch_scan()), done, failed)
+    
+    # ========== 实时行情 ==========
+    QUOTE_INTERVAL = 30
+    
+    def toggle_quotes(self):
+        """开启/关闭实时行情轮询"""
+        if not self.quote_var.get():
+            self.stop_quotes()
+            self.quote_positions = {}
+            self.update_quote_overlay()
+            self.quote_label.config(text="")
+            return
         
-        # 显示汇总结果
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(1.0, f"【快速扫描结果 - 共分析 {len(products)} 个商品】\n\n")
-        self.result_text.insert(tk.END, "【高估/极端高估商品】\n")
+        products = [p for p in self.product_combo['values'] if self.quote_provider.supports(p)]
+        if not products:
+            self.quote_var.set(False)
+            messagebox.showwarning("警告", f"{self.quote_provider.name}不支持当前数据中的商品")
+            return
         
-        high_estimated = [r for r in results_with_percentile if r[1] >= 80]
-        if high_estimated:
-            for product, percentile, status, emoji in high_estimated:
-                self.result_text.insert(tk.END, f"{emoji} {product}: {percentile:.1f}% - {status}\n")
-        else:
-            self.result_text.insert(tk.END, "暂无\n")
+        self.quote_label.config(text=f"正在获取{len(products)}个商品的实时行情...")
+        self.quote_poller = QuotePoller(
+            self.quote_provider, products, self.QUOTE_INTERVAL,
+            on_quotes=lambda quotes: self.root.after(0, self.handle_quotes, quotes),
+            on_error=lambda e: self.root.after(0, self.quote_label.config, {"text": f"获取实时行情失败: {e}"}))
+        self.quote_poller.start()
+    
+    def stop_quotes(self):
+        """停止实时行情轮询"""
+        if self.quote_poller is not None:
+            self.quote_poller.stop()
+            self.quote_poller = None
+        self.analysis_worker.cancel("quote")
+    
+    def handle_quotes(self, quotes):
+        """收到新行情：在分析线程中用已缓存的历史分布增量计算百分位（不重新分析）"""
+        if self.quote_poller is None:
+            return
         
-        self.result_text.insert(tk.END, "\n【低估/极端低估商品】\n")
-        low_estimated = [r for r in results_with_percentile if r[1] <= 20]
-        if low_estimated:
-            for product, percentile, status, emoji in low_estimated:
-                self.result_text.insert(tk.END, f"{emoji} {product}: {percentile:.1f}% - {status}\n")
-        else:
-            self.result_text.insert(tk.END, "暂无\n")
+        def job():
+            positions = {}
+            for product, quote in quotes.items():
+                position = self.analyzer.quote_position(product, quote["price"])
+                if position is not None:
+                    position["time"] = quote["time"]
+                    positions[product] = position
+            return positions
+        
+        self.analysis_worker.submit("quote", job, self.show_quote_positions)
+    
+    def show_quote_positions(self, positions):
+        """显示当前商品的实时价格位置，并更新图表上的实时价格线"""
+        if self.quote_poller is None:
+            return
+        self.quote_positions.update(positions)
         
-        self.result_text.insert(tk.END, "\n【合理区间商品】\n")
-        normal_estimated = [r for r in results_with_percentile if 20 < r[1] < 80]
-        if normal_estimated:
-            for product, percentile, status, emoji in normal_estimated:
-                self.result_text.insert(tk.END, f"{emoji} {product}: {percentile:.1f}%\n")
+        position = self.quote_positions.get(self.product_var.get())
+        if position is None:
+            self.quote_label.config(text=f"已更新{len(positions)}个商品的实时行情（当前商品无实时行情）")
         else:
-            self.result_text.insert(tk.END, "暂无\n")
+            change = f"{position['change_pct']:+.2f}%" if position["change_pct"] is not None else "N/A"
+            self.quote_label.config(text=f"{self.product_var.get()} 实时价格: {position['price']:.2f} ({change})  "
+                                         f"历史百分位: {position['percentile']:.1f}%  {position['status']}  "
+                                         f"[{position['time']}]")
+        self.update_quote_overlay()
+    
+    def update_quote_overlay(self):
+        """在期货价格走势图上显示（或隐藏）当前商品的实时价格线"""
+        if self.chart_artists is None:
+            return
         
-        if results_without_percentile:
-            self.result_text.insert(tk.END, f"\n【数据不足商品 ({len(results_without_percentile)}个)】\n")
-            for product, _, status, emoji in results_without_percentile:
-                self.result_text.insert(tk.END, f"{emoji} {product}: {status}\n")
+        panel = self.chart_artists["future"]
+        live_line = panel["live_line"]
+        position = self.quote_positions.get(self.chart_product)
+        if position is None:
+            if not live_line.get_visible():
+                return
+            live_line.set_label('_nolegend_')
+            live_line.set_visible(False)
+        else:
+            live_line.set_ydata([position["price"], position["price"]])
+            live_line.set_label(f'实时价格: {position["price"]:.2f} ({position["percentile"]:.1f}%)')
+            live_line.set_color(position["color"])
+            live_line.set_visible(True)
+        panel["ax"].legend(loc='upper left', fontsize=8)
+        self.canvas.draw_idle()
+    
+    # ========== 多商品对比 ==========
+    DASHBOARD_COLUMNS = {"主力合约价格": "期货价格", "现货价格": "现货价格"}
+    
+    def open_dashboard(self):
+        """打开多商品对比窗口：选择多个商品，以热力图显示各商品历史百分位随时间的变化"""
+        if self.dashboard is not None:
+            self.dashboard["window"].lift()
+            return
         
-        # 更新状态
-        self.status_label.config(text=f"快速扫描完成，发现{len(high_estimated)}个高估商品，{len(low_estimated)}个低估商品")
+        window = tk.Toplevel(self.root)
+        window.title("多商品历史百分位对比")
+        window.geometry("1200x700")
+        window.protocol("WM_DELETE_WINDOW", self.close_dashboard)
+        
+        # 左侧：商品多选列表
+        left_frame = ttk.Frame(window, padding="5")
+        left_frame.pack(side=tk.LEFT, fill=tk.Y)
+        
+        ttk.Label(left_frame, text="价格类型:").pack(anchor=tk.W)
+        column_var = tk.StringVar(value="期货价格")
+        column_combo = ttk.Combobox(left_frame, textvariable=column_var, state="readonly",
+                                    values=list(self.DASHBOARD_COLUMNS.values()), width=18)
+        column_combo.pack(fill=tk.X, pady=(0, 5))
+        column_combo.bind("<<ComboboxSelected>>", lambda event: self.refresh_dashboard())
+        
+        ttk.Label(left_frame, text="选择商品（可多选）:").pack(anchor=tk.W)
+        list_frame = ttk.Frame(left_frame)
+        list_frame.pack(fill=tk.Y, expand=True)
+        listbox = tk.Listbox(list_frame, selectmode=tk.EXTENDED, exportselection=False, width=20)
+        listbox.pack(side=tk.LEFT, fill=tk.Y, expand=True)
+        list_scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=listbox.yview)
+        list_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        listbox.configure(yscrollcommand=list_scrollbar.set)
+        for product in self.product_combo['values']:
+            listbox.insert(tk.END, product)
+        listbox.bind("<<ListboxSelect>>", lambda event: self.refresh_dashboard())
+        
+        button_frame = ttk.Frame(left_frame)
+        button_frame.pack(fill=tk.X, pady=(5, 0))
+        ttk.Button(button_frame, text="全选",
+                   command=lambda: (listbox.select_set(0, tk.END), self.refresh_dashboard())).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="清除",
+                   command=lambda: (listbox.select_clear(0, tk.END), self.refresh_dashboard())).pack(side=tk.LEFT)
+        
+        # 右侧：热力图
+        right_frame = ttk.Frame(window, padding="5")
+        right_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        figure = plt.figure(figsize=(10, 6))
+        canvas = FigureCanvasTkAgg(figure, master=right_frame)
+        toolbar = NavigationToolbar2Tk(canvas, right_frame)
+        toolbar.update()
+        toolbar.pack(side=tk.TOP, fill=tk.X)
+        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        status_label = ttk.Label(right_frame, text="请在左侧选择商品")
+        status_label.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        self.dashboard = {"window": window, "listbox": listbox, "column_var": column_var,
+                          "figure": figure, "canvas": canvas, "toolbar": toolbar,
+                          "status_label": status_label, "colorbar": None}
+        
+        # 默认选中当前商品
+        products = list(self.product_combo['values'])
+        current = self.product_var.get()
+        listbox.select_set(products.index(current) if current in products else 0)
+        self.refresh_dashboard()
     
-    def update_chart(self, product_data, analysis_dict):
-        """更新图表显示"""
-        # 清除inner_chart_frame中的所有组件
-        for widget in self.inner_chart_frame.winfo_children():
-            widget.destroy()
+    def close_dashboard(self):
+        """关闭多商品对比窗口"""
+        if self.dashboard is None:
+            return
+        self.analysis_worker.cancel("dashboard")
+        plt.close(self.dashboard["figure"])
+        self.dashboard["window"].destroy()
+        self.dashboard = None
+    
+    def refresh_dashboard(self):
+        """按当前选择刷新热力图；百分位历史在后台线程中一次性计算并缓存，切换选择不重新计算"""
+        dashboard = self.dashboard
+        if dashboard is None:
+            return
         
-        # 清除现有图表
-        if hasattr(self, 'figure') and self.figure is not None:
-            plt.close(self.figure)
-            self.figure = None
+        listbox = dashboard["listbox"]
+        products = [listbox.get(i) for i in listbox.curselection()]
+        label = dashboard["column_var"].get()
+        column = next((col for col, name in self.DASHBOARD_COLUMNS.items() if name == label), "主力合约价格")
+        dashboard["status_label"].config(text=f"正在计算{len(products)}个商品的历史百分位...")
         
-        # 清除工具栏引用
-        if hasattr(self, 'toolbar') and self.toolbar is not None:
-            self.toolbar.destroy()
-            self.toolbar = None
+        def job():
+            history = self.analyzer.percentile_history(column)
+            return history.reindex(columns=[p for p in products if p in history.columns])
         
-        # 清除提示标签引用
-        if self.hint_label is not None:
-            self.hint_label.destroy()
-            self.hint_label = None
+        def failed(e):
+            dashboard["status_label"].config(text=f"计算历史百分位失败: {str(e)}")
         
-        # 获取窗口大小，动态调整图表尺寸
-        window_width = self.root.winfo_width()
-        window_height = self.root.winfo_height()
+        self.analysis_worker.submit("dashboard", job, lambda history: self.render_dashboard(history, label), failed)
+    
+    def render_dashboard(self, history, label):
+        """绘制热力图：行为商品、列为日期、颜色为当日价格在此前历史中的百分位"""
+        dashboard = self.dashboard
+        if dashboard is None:
+            return
+        
+        figure = dashboard["figure"]
+        figure.clf()
+        dashboard["colorbar"] = None
+        history = history.dropna(how="all")
+        
+        if history.empty or history.shape[1] == 0:
+            ax = figure.add_subplot(111)
+            ax.set_axis_off()
+            ax.text(0.5, 0.5, "请在左侧选择商品", ha='center', va='center', transform=ax.transAxes, fontsize=12)
+            dashboard["canvas"].draw_idle()
+            dashboard["status_label"].config(text="未选择商品或所选商品没有数据")
+            return
+        
+        products = list(history.columns)
+        dates = pd.to_datetime(history.index)
+        x = mdates.date2num(dates)
+        values = np.ma.masked_invalid(history.to_numpy(dtype=float).T)
+        
+        ax = figure.add_subplot(111)
+        cmap = plt.get_cmap("RdYlGn_r").copy()
+        cmap.set_bad("lightgrey")
+        # 交易日不连续（周末、节假日），每个格子以相邻交易日的中点为边界，格子中心正好对应其日期
+        if len(x) > 1:
+            middle = (x[1:] + x[:-1]) / 2
+            x_edges = np.concatenate([[x[0] - (middle[0] - x[0])], middle, [x[-1] + (x[-1] - middle[-1])]])
+        else:
+            x_edges = np.array([x[0] - 0.5, x[0] + 0.5])
+        y_edges = np.arange(len(products) + 1) - 0.5
+        image = ax.pcolormesh(x_edges, y_edges, values, cmap=cmap, vmin=0, vmax=100, shading="flat")
+        ax.set_xlim(x_edges[0], x_edges[-1])
+        ax.set_ylim(y_edges[-1], y_edges[0])
+        ax.xaxis_date()
+        ax.set_yticks(range(len(products)))
+        ax.set_yticklabels(products, fontsize=max(5, min(10, 400 // len(products))))
+        ax.set_xlabel("日期")
+        ax.set_title(f"{label}历史百分位对比（{len(products)}个商品）", fontsize=12, fontweight='bold')
+        dashboard["colorbar"] = figure.colorbar(image, ax=ax, label="历史百分位(%)")
+        
+        def format_coord(x_value, y_value):
+            row = int(round(y_value))
+            col = int(np.clip(np.searchsorted(x_edges, x_value, side="right") - 1, 0, len(x) - 1))
+            if not 0 <= row < len(products):
+                return ""
+            value = history.iat[col, row]
+            value_text = f"{value:.1f}%" if pd.notna(value) else "无数据"
+            return f"{products[row]}  {dates[col].strftime('%Y-%m-%d')}  百分位: {value_text}"
+        
+        ax.format_coord = format_coord
+        figure.tight_layout()
+        dashboard["canvas"].draw_idle()
+        dashboard["toolbar"].update()
+        
+        # 最新百分位排名
+        latest = history.ffill().iloc[-1].sort_values(ascending=False)
+        top = "、".join(f"{product} {value:.0f}%" for product, value in latest.head(3).items() if pd.notna(value))
+        dashboard["status_label"].config(text=f"共{len(products)}个商品，{len(dates)}个交易日；最新百分位最高: {top}")
+    
+    # 分位数线的颜色和标签（图1、图2）
+    QUANTILE_LINES = [(80, 'orange'), (99, 'red'), (20, 'green'), (1, 'darkgreen')]
+    # 直方图中的分位数线（分位, 颜色）
+    HIST_QUANTILES = [(1, 'green'), (20, 'lightgreen'), (80, 'orange'), (99, 'red')]
+    HIST_BINS = 30
+    # 降采样时每个像素宽度保留的数据点数，以及最少保留的点数
+    LOD_POINTS_PER_PIXEL = 2
+    LOD_MIN_POINTS = 400
+    
+    def build_analysis_chart(self):
+        """创建2×2分析图表及其全部图元，之后切换商品只更新图元数据"""
+        self.figure.clf()
         
         # 根据窗口大小调整图表尺寸
-        chart_width = max(14, window_width / 80)  # 动态宽度
-        chart_height = max(8, window_height / 100)  # 动态高度
+        window_width = self.root.winfo_width()
+        window_height = self.root.winfo_height()
+        self.figure.set_size_inches(max(14, window_width / 80), max(8, window_height / 100))
+        
+        axes = self.figure.subplots(2, 2)
+        artists = {"axes": axes}
+        
+        # 图1、图2：期货/现货价格走势（价格线、分位数线、最新价格标注）
+        for key, ax, label, color in [("future", axes[0, 0], '期货价格', 'blue'),
+                                      ("spot", axes[0, 1], '现货价格', 'purple')]:
+            ax.xaxis_date()
+            ax.set_xlabel('日期', fontsize=10)
+            ax.set_ylabel(label, fontsize=10)
+            ax.grid(True, alpha=0.3)
+            line, = ax.plot([], [], label=label, color=color, linewidth=2)
+            quantile_lines = {q: ax.axhline(y=0, color=c, linestyle='--', alpha=0.7, visible=False)
+                              for q, c in self.QUANTILE_LINES}
+            marker = ax.scatter([], [], s=100, zorder=5)
+            annotation = ax.annotate('', xy=(0, 0), xytext=(10, 10), textcoords='offset points', fontsize=9,
+                                     bbox=dict(boxstyle="round,pad=0.3", fc="white", alpha=0.8), visible=False)
+            artists[key] = {"ax": ax, "line": line, "quantile_lines": quantile_lines,
+                            "marker": marker, "annotation": annotation, "label": label,
+                            "full_x": np.array([]), "full_y": np.array([])}
+            if key == "future":
+                # 实时价格线（开启实时行情后显示）
+                artists[key]["live_line"] = ax.axhline(y=0, linestyle='-.', linewidth=1.5, visible=False,
+                                                       label='_nolegend_')
+            ax.callbacks.connect('xlim_changed', self.on_chart_xlim_changed)
+        
+        # 图3：基差走势
+        ax3 = axes[1, 0]
+        ax3.xaxis_date()
+        ax3.axhline(y=0, color='black', linestyle='-', alpha=0.3)
+        ax3.set_xlabel('日期', fontsize=10)
+        ax3.set_ylabel('基差', fontsize=10)
+        ax3.grid(True, alpha=0.3)
+        artists["basis"] = {
+            "ax": ax3,
+            "fills": [],
+            "annotation": ax3.annotate('', xy=(0, 0), xytext=(10, 10), textcoords='offset points', fontsize=9,
+                                       bbox=dict(boxstyle="round,pad=0.3", fc="white", alpha=0.8), visible=False),
+            "full_x": np.array([]), "full_y": np.array([]),
+        }
+        ax3.callbacks.connect('xlim_changed', self.on_chart_xlim_changed)
         
-        # 创建新的图表 - 使用动态尺寸
-        self.figure, axes = plt.subplots(2, 2, figsize=(chart_width, chart_height))
+        # 图4：价格分布直方图（固定数量的柱子，更新时只改变位置和高度）
+        ax4 = axes[1, 1]
+        bars = ax4.bar(np.zeros(self.HIST_BINS), np.zeros(self.HIST_BINS), width=1, align='edge',
+                       alpha=0.7, color='skyblue', edgecolor='black')
+        current_line = ax4.axvline(x=0, color='red', linewidth=2, linestyle='--', visible=False)
+        hist_quantile_lines = {q: ax4.axvline(x=0, color=c, linewidth=1.5, linestyle=':', alpha=0.7, visible=False)
+                               for q, c in self.HIST_QUANTILES}
+        ax4.set_xlabel('价格', fontsize=10)
+        ax4.set_ylabel('频次', fontsize=10)
+        ax4.grid(True, alpha=0.3)
+        artists["hist"] = {"ax": ax4, "bars": bars, "current_line": current_line,
+                           "quantile_lines": hist_quantile_lines}
+        
+        artists["suptitle"] = self.figure.suptitle('', fontsize=14, fontweight='bold')
+        self.chart_artists = artists
+    
+    @staticmethod
+    def _padded_limits(low, high, ratio=0.05):
+        """带边距的坐标轴范围"""
+        if not np.isfinite(low) or not np.isfinite(high):
+            return 0, 1
+        if high == low:
+            pad = abs(high) * ratio or 1
+        else:
+            pad = (high - low) * ratio
+        return low - pad, high + pad
+    
+    def _lod_points(self, ax):
+        """根据坐标轴的像素宽度决定降采样后保留的点数"""
+        return max(self.LOD_MIN_POINTS, int(ax.bbox.width * self.LOD_POINTS_PER_PIXEL))
+    
+    def _render_basis(self, panel, x, y):
+        """用两块填充区域绘制基差（正为绿、负为红），替代逐日的柱状图"""
+        for fill in panel["fills"]:
+            fill.remove()
+        panel["fills"] = []
+        if len(x) == 0:
+            return
         
-        # 获取分析结果
-        spot_info = analysis_dict.get("spot", {})
-        future_info = analysis_dict.get("future", {})
-        product_name = analysis_dict.get("product_name", "未知商品")
+        ax = panel["ax"]
+        panel["fills"] = [
+            ax.fill_between(x, y, 0, where=y >= 0, interpolate=True, color='green', alpha=0.6, linewidth=0),
+            ax.fill_between(x, y, 0, where=y < 0, interpolate=True, color='red', alpha=0.6, linewidth=0),
+        ]
+    
+    def on_chart_xlim_changed(self, ax):
+        """可视范围变化时（切换商品、缩放、平移）按可视区间重新降采样，缩放后显示更多细节"""
+        artists = self.chart_artists
+        if artists is None:
+            return
         
-        # 第一幅图：期货价格走势
-        ax1 = axes[0, 0]
-        if "主力合约价格" in product_data.columns:
-            prices = product_data["主力合约价格"].dropna()
-            dates = product_data.loc[prices.index, "日期"]
-            
-            ax1.plot(dates, prices, label='期货价格', color='blue', linewidth=2)
-            ax1.set_xlabel('日期', fontsize=10)
-            ax1.set_ylabel('期货价格', fontsize=10)
-            ax1.set_title(f'{product_name} - 期货价格走势', fontsize=12, fontweight='bold')
-            ax1.grid(True, alpha=0.3)
+        x_min, x_max = ax.get_xlim()
+        for key in ("future", "spot", "basis"):
+            panel = artists[key]
+            if panel["ax"] is not ax:
+                continue
             
-            # 添加分位数线
-            if "historical_80_percentile" in future_info:
-                ax1.axhline(y=future_info["historical_80_percentile"], color='orange', linestyle='--', 
-                           alpha=0.7, label=f'80%分位: {future_info["historical_80_percentile"]:.2f}')
-            if "historical_99_percentile" in future_info:
-                ax1.axhline(y=future_info["historical_99_percentile"], color='red', linestyle='--', 
-                           alpha=0.7, label=f'99%分位: {future_info["historical_99_percentile"]:.2f}')
-            if "historical_20_percentile" in future_info:
-                ax1.axhline(y=future_info["historical_20_percentile"], color='green', linestyle='--', 
-                           alpha=0.7, label=f'20%分位: {future_info["historical_20_percentile"]:.2f}')
-            if "historical_1_percentile" in future_info:
-                ax1.axhline(y=future_info["historical_1_percentile"], color='darkgreen', linestyle='--', 
-                           alpha=0.7, label=f'1%分位: {future_info["historical_1_percentile"]:.2f}')
-            
-            # 标注最新价格
-            if len(prices) > 0:
-                latest_price = prices.iloc[-1]
-                latest_date = dates.iloc[-1]
-                
-                # 根据价格状态选择标注颜色
-                color = future_info.get("color", "black")
-                ax1.scatter(latest_date, latest_price, color=color, s=100, zorder=5)
-                ax1.annotate(f'当前: {latest_price:.2f}\n({future_info.get("percentile", "N/A"):.1f}%)', 
-                            xy=(latest_date, latest_price), 
-                            xytext=(10, 10), 
-                            textcoords='offset points',
-                            fontsize=9,
-                            bbox=dict(boxstyle="round,pad=0.3", fc="white", alpha=0.8),
-                            color=color)
+            full_x, full_y = panel["full_x"], panel["full_y"]
+            visible = visible_slice(full_x, x_min, x_max)
+            x, y = downsample_minmax(full_x[visible], full_y[visible], self._lod_points(ax))
+            if key == "basis":
+                self._render_basis(panel, x, y)
+            else:
+                panel["line"].set_data(x, y)
+            break
+    
+    def _update_price_panel(self, panel, product_data, column, info, product_name):
+        """更新价格走势图（图1、图2）的图元数据"""
+        ax = panel["ax"]
+        ax.set_title(f'{product_name} - {panel["label"]}走势', fontsize=12, fontweight='bold')
+        
+        prices = product_data[column].dropna() if column in product_data.columns else pd.Series(dtype=float)
+        x = mdates.date2num(product_data.loc[prices.index, "日期"]) if len(prices) else np.array([])
+        y = prices.to_numpy(dtype=float)
+        # 保存完整序列，实际显示的点由on_chart_xlim_changed按可视范围降采样
+        panel["full_x"], panel["full_y"] = x, y
+        panel["line"].set_data(*downsample_minmax(x, y, self._lod_points(ax)))
+        
+        # 分位数线
+        for q, line in panel["quantile_lines"].items():
+            value = info.get(f"historical_{q}_percentile")
+            if value is not None and len(y):
+                line.set_ydata([value, value])
+                line.set_label(f'{q}%分位: {value:.2f}')
+                line.set_visible(True)
+            else:
+                line.set_label('_nolegend_')
+                line.set_visible(False)
+        
+        # 标注最新价格（根据价格状态选择标注颜色）
+        marker, annotation = panel["marker"], panel["annotation"]
+        if len(y):
+            color = info.get("color", "black")
+            marker.set_offsets([[x[-1], y[-1]]])
+            marker.set_color(color)
+            percentile = info.get("percentile")
+            percentile_text = f"{percentile:.1f}%" if percentile is not None else "N/A"
+            annotation.xy = (x[-1], y[-1])
+            annotation.set_text(f'当前: {y[-1]:.2f}\n({percentile_text})')
+            annotation.set_color(color)
+            annotation.set_visible(True)
             
-            ax1.legend(loc='upper left', fontsize=8)
+            y_values = [y.min(), y.max()] + [line.get_ydata()[0] for line in panel["quantile_lines"].values()
+                                             if line.get_visible()]
+            ax.set_xlim(*self._padded_limits(x[0], x[-1]))
+            ax.set_ylim(*self._padded_limits(min(y_values), max(y_values)))
+        else:
+            marker.set_offsets(np.empty((0, 2)))
+            annotation.set_visible(False)
         
-        # 第二幅图：现货价格走势
-        ax2 = axes[0, 1]
-        if "现货价格" in product_data.columns:
-            prices = product_data["现货价格"].dropna()
-            dates = product_data.loc[prices.index, "日期"]
-            
-            ax2.plot(dates, prices, label='现货价格', color='purple', linewidth=2)
-            ax2.set_xlabel('日期', fontsize=10)
-            ax2.set_ylabel('现货价格', fontsize=10)
-            ax2.set_title(f'{product_name} - 现货价格走势', fontsize=12, fontweight='bold')
-            ax2.grid(True, alpha=0.3)
-            
-            # 添加分位数线
-            if "historical_80_percentile" in spot_info:
-                ax2.axhline(y=spot_info["historical_80_percentile"], color='orange', linestyle='--', 
-                           alpha=0.7, label=f'80%分位: {spot_info["historical_80_percentile"]:.2f}')
-            if "historical_99_percentile" in spot_info:
-                ax2.axhline(y=spot_info["historical_99_percentile"], color='red', linestyle='--', 
-                           alpha=0.7, label=f'99%分位: {spot_info["historical_99_percentile"]:.2f}')
-            if "historical_20_percentile" in spot_info:
-                ax2.axhline(y=spot_info["historical_20_percentile"], color='green', linestyle='--', 
-                           alpha=0.7, label=f'20%分位: {spot_info["historical_20_percentile"]:.2f}')
-            if "historical_1_percentile" in spot_info:
-                ax2.axhline(y=spot_info["historical_1_percentile"], color='darkgreen', linestyle='--', 
-                           alpha=0.7, label=f'1%分位: {spot_info["historical_1_percentile"]:.2f}')
-            
-            # 标注最新价格
-            if len(prices) > 0:
-                latest_price = prices.iloc[-1]
-                latest_date = dates.iloc[-1]
-                
-                # 根据价格状态选择标注颜色
-                color = spot_info.get("color", "black")
-                ax2.scatter(latest_date, latest_price, color=color, s=100, zorder=5)
-                ax2.annotate(f'当前: {latest_price:.2f}\n({spot_info.get("percentile", "N/A"):.1f}%)', 
-                            xy=(latest_date, latest_price), 
-                            xytext=(10, 10), 
-                            textcoords='offset points',
-                            fontsize=9,
-                            bbox=dict(boxstyle="round,pad=0.3", fc="white", alpha=0.8),
-                            color=color)
-            
-            ax2.legend(loc='upper left', fontsize=8)
+        ax.legend(loc='upper left', fontsize=8)
+    
+    def _update_basis_panel(self, panel, product_data, product_name):
+        """更新基差走势图（图3）"""
+        ax = panel["ax"]
+        ax.set_title(f'{product_name} - 基差走势', fontsize=12, fontweight='bold')
+        
+        basis = product_data["基差"].dropna() if "基差" in product_data.columns else pd.Series(dtype=float)
+        x = mdates.date2num(product_data.loc[basis.index, "日期"]) if len(basis) else np.array([])
+        y = basis.to_numpy(dtype=float)
+        panel["full_x"], panel["full_y"] = x, y
+        
+        annotation = panel["annotation"]
+        if len(y) == 0:
+            self._render_basis(panel, x, y)
+            annotation.set_visible(False)
+            return
         
-        # 第三幅图：基差走势
-        ax3 = axes[1, 0]
-        if "基差" in product_data.columns:
-            basis = product_data["基差"].dropna()
-            dates = product_data.loc[basis.index, "日期"]
-            
-            # 根据基差正负使用不同颜色
-            colors = ['green' if b >= 0 else 'red' for b in basis]
-            ax3.bar(dates, basis, color=colors, alpha=0.6, width=0.8)
-            ax3.axhline(y=0, color='black', linestyle='-', alpha=0.3)
-            ax3.set_xlabel('日期', fontsize=10)
-            ax3.set_ylabel('基差', fontsize=10)
-            ax3.set_title(f'{product_name} - 基差走势', fontsize=12, fontweight='bold')
-            ax3.grid(True, alpha=0.3)
-            
-            # 添加最新基差标注
-            if len(basis) > 0:
-                latest_basis = basis.iloc[-1]
-                latest_date = dates.iloc[-1]
-                ax3.annotate(f'当前: {latest_basis:.2f}', 
-                            xy=(latest_date, latest_basis), 
-                            xytext=(10, 10 if latest_basis >= 0 else -20), 
-                            textcoords='offset points',
-                            fontsize=9,
-                            bbox=dict(boxstyle="round,pad=0.3", fc="white", alpha=0.8))
-        
-        # 第四幅图：价格分布直方图
-        ax4 = axes[1, 1]
-        if "主力合约价格" in product_data.columns:
-            prices = product_data["主力合约价格"].dropna()
-            
-            # 绘制直方图
-            n, bins, patches = ax4.hist(prices, bins=30, alpha=0.7, color='skyblue', edgecolor='black')
-            
-            # 标记当前价格位置
-            if "current_price" in future_info:
-                current_price = future_info["current_price"]
-                ax4.axvline(x=current_price, color='red', linewidth=2, linestyle='--', 
-                           label=f'当前价格: {current_price:.2f}')
-            
-            # 标记关键分位数
-            colors = ['green', 'lightgreen', 'orange', 'red']
-            percentiles = [1, 20, 80, 99]
-            percentile_values = []
-            percentile_labels = []
-            
-            for p in percentiles:
-                try:
-                    value = np.percentile(prices, p)
-                    percentile_values.append(value)
-                    percentile_labels.append(f'{p}%')
-                except:
-                    pass
-            
-            for i, (value, label) in enumerate(zip(percentile_values, percentile_labels)):
-                if i < len(colors):
-                    ax4.axvline(x=value, color=colors[i], linewidth=1.5, linestyle=':', 
-                               alpha=0.7, label=f'{label}分位: {value:.2f}')
-            
-            ax4.set_xlabel('价格', fontsize=10)
-            ax4.set_ylabel('频次', fontsize=10)
-            ax4.set_title(f'{product_name} - 价格分布直方图', fontsize=12, fontweight='bold')
-            ax4.grid(True, alpha=0.3)
-            ax4.legend(loc='upper right', fontsize=8)
+        # 添加最新基差标注
+        annotation.xy = (x[-1], y[-1])
+        annotation.set_text(f'当前: {y[-1]:.2f}')
+        annotation.set_position((10, 10 if y[-1] >= 0 else -20))
+        annotation.set_visible(True)
         
-        self.figure.suptitle(f'{product_name} - 价格位置分析 ({future_info.get("status", "未知状态")})', 
-                            fontsize=14, fontweight='bold')
-        self.figure.tight_layout()
+        ax.set_xlim(*self._padded_limits(x[0], x[-1]))
+        ax.set_ylim(*self._padded_limits(min(y.min(), 0), max(y.max(), 0)))
+    
+    def _update_hist_panel(self, panel, product_data, future_info, product_name):
+        """更新价格分布直方图（图4）：复用固定数量的柱子，只更新位置和高度"""
+        ax = panel["ax"]
+        ax.set_title(f'{product_name} - 价格分布直方图', fontsize=12, fontweight='bold')
+        
+        prices = product_data["主力合约价格"].dropna().to_numpy(dtype=float) \
+            if "主力合约价格" in product_data.columns else np.array([])
+        
+        if len(prices) == 0:
+            for rect in panel["bars"]:
+                rect.set_height(0)
+            panel["current_line"].set_visible(False)
+            for line in panel["quantile_lines"].values():
+                line.set_visible(False)
+            return
         
-        # 嵌入到Tkinter
-        self.canvas = FigureCanvasTkAgg(self.figure, master=self.inner_chart_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=5, pady=5)
+        counts, edges = np.histogram(prices, bins=self.HIST_BINS)
+        for rect, count, left, right in zip(panel["bars"], counts, edges[:-1], edges[1:]):
+            rect.set_x(left)
+            rect.set_width(right - left)
+            rect.set_height(count)
         
-        # 添加matplotlib工具栏
-        self.create_matplotlib_toolbar()
+        # 标记当前价格位置
+        current_line = panel["current_line"]
+        if "current_price" in future_info:
+            current_price = future_info["current_price"]
+            current_line.set_xdata([current_price, current_price])
+            current_line.set_label(f'当前价格: {current_price:.2f}')
+            current_line.set_visible(True)
+        else:
+            current_line.set_label('_nolegend_')
+            current_line.set_visible(False)
+        
+        # 标记关键分位数
+        for (q, _), value in zip(self.HIST_QUANTILES, np.percentile(prices, [q for q, _ in self.HIST_QUANTILES])):
+            line = panel["quantile_lines"][q]
+            line.set_xdata([value, value])
+            line.set_label(f'{q}%分位: {value:.2f}')
+            line.set_visible(True)
+        
+        ax.set_xlim(*self._padded_limits(edges[0], edges[-1]))
+        ax.set_ylim(0, counts.max() * 1.05 if counts.max() > 0 else 1)
+        ax.legend(loc='upper right', fontsize=8)
+    
+    def update_chart(self, product_data, analysis_dict):
+        """更新图表显示（复用同一图表，只更新图元数据后重绘）"""
+        if self.chart_artists is None:
+            self.build_analysis_chart()
+            first_draw = True
+        else:
+            first_draw = False
+        artists = self.chart_artists
+        
+        # 获取分析结果
+        spot_info = analysis_dict.get("spot", {})
+        future_info = analysis_dict.get("future", {})
+        product_name = analysis_dict.get("product_name", "未知商品")
+        
+        self._update_price_panel(artists["future"], product_data, "主力合约价格", future_info, product_name)
+        self._update_price_panel(artists["spot"], product_data, "现货价格", spot_info, product_name)
+        self._update_basis_panel(artists["basis"], product_data, product_name)
+        self._update_hist_panel(artists["hist"], product_data, future_info, product_name)
+        
+        artists["suptitle"].set_text(f'{product_name} - 价格位置分析 ({future_info.get("status", "未知状态")})')
+        self.chart_product = product_name
+        if self.quote_positions:
+            self.update_quote_overlay()
+        if first_draw:
+            self.figure.tight_layout()
+        
+        self.canvas.draw_idle()
+        # 重置工具栏的视图历史，使"主页"按钮回到当前商品的完整视图
+        self.toolbar.update()
         
         # 创建提示标签（只创建一个）
         if self.hint_label is None:
@@ -1224,20 +3247,528 @@ class FutureAnalysisApp:
         
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")],
+            filetypes=[("CSV文件", "*.csv"), ("Parquet文件", "*.parquet"), ("所有文件", "*.*")],
             initialfile="future_data.csv"
         )
         
         if file_path:
             try:
-                self.data.to_csv(file_path, index=False, encoding='utf-8-sig')
+                if file_path.lower().endswith(".parquet"):
+                    self.data.to_parquet(file_path, index=False)
+                else:
+                    self.data.to_csv(file_path, index=False, encoding='utf-8-sig')
                 self.status_label.config(text=f"数据已保存到: {file_path}")
                 messagebox.showinfo("成功", f"数据已成功保存到:\n{file_path}")
             except Exception as e:
                 messagebox.showerror("错误", f"保存文件时发生错误:\n{str(e)}")
 
+# ========== 基准测试 ==========
+def generate_synthetic_future_data(products=50, days=1000, start_date="2015-01-01", seed=0):
+    """
+    生成与FutureDataFetcher.HEADER结构相同的模拟数据（N个商品 × M个交易日）
+    与网络获取的结果一样全部为字符串，百分比带%号，便于覆盖数据清洗和类型转换
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, periods=days)
+    date_strings = np.tile(dates.strftime("%Y-%m-%d").to_numpy(), products)
+    names = np.repeat(np.array([f"商品{i:03d}" for i in range(products)], dtype=object), days)
+    exchanges = np.repeat(np.array(["上海期货交易所", "大连商品交易所", "郑州商品交易所"], dtype=object)[
+        np.arange(products) % 3], days)
+    
+    # 每个商品的价格为几何随机游走，现货围绕主力合约波动
+    base = np.repeat(rng.uniform(1000, 80000, products), days)
+    log_returns = rng.normal(0, 0.012, (products, days))
+    main_price = base * np.exp(np.cumsum(log_returns, axis=1).ravel())
+    spot_price = main_price * (1 + rng.normal(0, 0.01, products * days))
+    near_price = main_price * (1 + rng.normal(0, 0.005, products * days))
+    
+    # 主力合约为两个月后的合约（YYMM），近月合约为下个月
+    def contract(offset):
+        month_index = dates.year.to_numpy() * 12 + dates.month.to_numpy() - 1 + offset
+        codes = (month_index // 12 % 100) * 100 + month_index % 12 + 1
+        return np.tile(np.char.add("c", np.char.zfill(codes.astype(str), 4)), products)
+    
+    def fmt(values):
+        return np.char.mod("%.2f", values)
+    
+    frame = pd.DataFrame({
+        "商品": names,
+        "现货价格": fmt(spot_price),
+        "最近合约代码": contract(1),
+        "最近合约价格": fmt(near_price),
+        "最近合约现期差1": fmt(spot_price - near_price),
+        "最近合约期现差百分比1": np.char.add(fmt((spot_price - near_price) / spot_price * 100), "%"),
+        "主力合约代码": contract(2),
+        "主力合约价格": fmt(main_price),
+        "主力合约现期差2": fmt(spot_price - main_price),
+        "主力合约现期差百分比2": np.char.add(fmt((spot_price - main_price) / spot_price * 100), "%"),
+        "日期": date_strings,
+        "交易所": exchanges,
+    })
+    return frame
+
+def _benchmark_steps(raw_data, sample_products):
+    """基准测试的各个步骤：(名称, 准备函数, 被测函数)，准备函数的返回值传给被测函数"""
+    def loaded():
+        analyzer = FutureDataAnalyzer()
+        analyzer.set_data(raw_data.copy())
+        return analyzer
+    
+    def warm():
+        analyzer = loaded()
+        for product in sample_products:
+            analyzer.analyze_product(product)
+        return analyzer
+    
+    def analyze_products(analyzer):
+        for product in sample_products:
+            analyzer.analyze_product(product)
+    
+    # 最后一个交易日单独追加：跟踪器在之前的历史上建好，追加后只做增量更新
+    last_date = raw_data["日期"].max()
+    history_data = raw_data[raw_data["日期"] != last_date].reset_index(drop=True)
+    last_day = raw_data[raw_data["日期"] == last_date].reset_index(drop=True)
+    
+    def warm_history():
+        analyzer = FutureDataAnalyzer()
+        analyzer.set_data(history_data.copy())
+        for product in sample_products:
+            analyzer.analyze_product(product)
+        return analyzer
+    
+    def append_day(analyzer):
+        analyzer.append_data(last_day)
+        analyze_products(analyzer)
+    
+    def price_positions(analyzer):
+        for product in sample_products:
+            rows = analyzer.product_index[product]
+            analyzer.analyze_price_position(analyzer.data["主力合约价格"].iloc[rows].dropna())
+    
+    def chart_preparation(analyzer):
+        for product in sample_products:
+            _, product_data, _ = analyzer.get_analysis_summary(product)
+            prices = product_data["主力合约价格"].dropna()
+            x = product_data.loc[prices.index, "日期"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+            downsample_minmax(x, prices.to_numpy(dtype=float), 2000)
+            np.histogram(prices.to_numpy(dtype=float), bins=30)
+    
+    def fresh_history(analyzer):
+        analyzer.percentile_history_cache = {}
+        analyzer.percentile_history()
+    
+    def fresh_indicators(analyzer):
+        analyzer.indicator_cache = None
+        analyzer.get_indicators()
+    
+    per_product = f"×{len(sample_products)}商品"
+    return [
+        ("set_data（清洗+索引）", lambda: raw_data.copy(), lambda data: FutureDataAnalyzer().set_data(data)),
+        (f"analyze_product 首次{per_product}", loaded, analyze_products),
+        (f"analyze_product 增量{per_product}", warm, analyze_products),
+        (f"append_data 追加1天+analyze_product{per_product}", warm_history, append_day),
+        (f"analyze_price_position{per_product}", loaded, price_positions),
+        ("batch_scan（快速扫描）", loaded, lambda analyzer: analyzer.batch_scan()),
+        (f"图表数据准备{per_product}", warm, chart_preparation),
+        ("percentile_history（对比热力图）", loaded, fresh_history),
+        ("衍生指标", loaded, fresh_indicators),
+    ]
+
+def run_analyzer_benchmark(sizes, repeat=3, sample_count=5, progress=None):
+    """
+    按不同规模（商品数, 交易日数）测量各分析步骤的耗时（最佳值）和峰值内存（tracemalloc）
+    返回：每个(规模, 步骤)一行的DataFrame
+    """
+    import tracemalloc
+    
+    # 先完成延迟导入（含scipy），避免首次导入耗时计入第一个规模的测量结果
+    preload_modules()
+    percentileofscore_weak([0.0], 0.0)
+    
+    results = []
+    for products, days in sizes:
+        raw_data = generate_synthetic_future_data(products, days)
+        sample_products = [f"商品{i:03d}" for i in range(min(sample_count, products))]
+        
+        for name, setup, func in _benchmark_steps(raw_data, sample_products):
+            if progress is not None:
+                progress(f"{products}×{days} {name}")
+            
+            timings = []
+            for _ in range(repeat):
+                arg = setup()
+                start = time.perf_counter()
+                func(arg)
+                timings.append(time.perf_counter() - start)
+            
+            # 峰值内存单独测一次（tracemalloc会拖慢执行，不计入耗时）
+            arg = setup()
+            tracemalloc.start()
+            try:
+                func(arg)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            
+            results.append({
+                "规模": f"{products}×{days}",
+                "商品数": products,
+                "交易日数": days,
+                "步骤": name,
+                "最佳耗时ms": min(timings) * 1000,
+                "平均耗时ms": sum(timings) / len(timings) * 1000,
+                "峰值内存MB": peak / 1024 / 1024,
+            })
+    return pd.DataFrame(results)
+
+def compare_benchmark(result, baseline, tolerance=0.25):
+    """与基线结果比较，返回最佳耗时超出基线tolerance比例的步骤"""
+    merged = result.merge(baseline[["规模", "步骤", "最佳耗时ms"]], on=["规模", "步骤"], suffixes=("", "_基线"))
+    merged["变化"] = merged["最佳耗时ms"] / merged["最佳耗时ms_基线"] - 1
+    return merged[merged["变化"] > tolerance]
+
+
+# ========== 命令行模式 ==========
+def build_arg_parser():
+    """命令行参数（不带参数运行时启动图形界面）"""
+    parser = argparse.ArgumentParser(description="期货价格分析系统 - 命令行模式（不加载图形界面，适合定时任务）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    def add_store_args(sub):
+        sub.add_argument("--store", help="本地数据库目录（默认~/.futures_analysis/store）")
+    
+    def add_output_args(sub):
+        sub.add_argument("--output", "-o", help="输出文件路径（默认输出CSV到标准输出）")
+        sub.add_argument("--format", choices=["csv", "json"], help="输出格式（默认根据文件扩展名判断）")
+    
+    def add_alert_args(sub):
+        sub.add_argument("--alerts", action="store_true", help="扫描后求值预警规则，新预警写入日志并输出到标准错误")
+        sub.add_argument("--rules", help="预警规则文件（默认~/.futures_analysis/alert_rules.json，不存在时使用默认规则）")
+        sub.add_argument("--alert-log", help="预警日志CSV（默认~/.futures_analysis/alerts.csv）")
+    
+    fetch_parser = subparsers.add_parser("fetch", help="获取日期范围内的数据并写入本地数据库")
+    fetch_parser.add_argument("--start", required=True, help="开始日期 YYYY-MM-DD")
+    fetch_parser.add_argument("--end", default=datetime.now().strftime("%Y-%m-%d"), help="结束日期 YYYY-MM-DD（默认今天）")
+    fetch_parser.add_argument("--workers", type=int, default=8, help="最大并发请求数")
+    fetch_parser.add_argument("--no-cache", action="store_true", help="不使用本地按日缓存")
+    fetch_parser.add_argument("--save-html", metavar="DIR", help="同时保存原始页面到目录（可作为解析器基准测试样本）")
+    add_store_args(fetch_parser)
+    
+    scan_parser = subparsers.add_parser("scan", help="扫描全部商品的价格位置")
+    scan_parser.add_argument("--input", "-i", help="输入CSV/Parquet文件（默认读取本地数据库）")
+    scan_parser.add_argument("--start", help="只使用该日期之后的数据")
+    scan_parser.add_argument("--end", help="只使用该日期之前的数据")
+    add_store_args(scan_parser)
+    add_output_args(scan_parser)
+    add_alert_args(scan_parser)
+    
+    indicators_parser = subparsers.add_parser("indicators", help="计算全部商品最新的衍生指标（期限价差、基差Z分数、年化基差率、波动率）")
+    indicators_parser.add_argument("--input", "-i", help="输入CSV/Parquet文件（默认读取本地数据库）")
+    indicators_parser.add_argument("--start", help="只使用该日期之后的数据")
+    indicators_parser.add_argument("--end", help="只使用该日期之前的数据")
+    indicators_parser.add_argument("--history", action="store_true", help="输出每个交易日的指标（默认只输出最新一天）")
+    add_store_args(indicators_parser)
+    add_output_args(indicators_parser)
+    
+    update_parser = subparsers.add_parser("update", help="获取最近几天数据写入本地数据库，然后扫描全部商品")
+    update_parser.add_argument("--days", type=int, default=7, help="获取最近多少天的数据（默认7）")
+    update_parser.add_argument("--workers", type=int, default=8, help="最大并发请求数")
+    add_store_args(update_parser)
+    add_output_args(update_parser)
+    add_alert_args(update_parser)
+    
+    quotes_parser = subparsers.add_parser("quotes", help="轮询实时行情，输出最新价格在历史价格中的百分位")
+    quotes_parser.add_argument("--input", "-i", help="历史数据CSV/Parquet文件（默认读取本地数据库）")
+    quotes_parser.add_argument("--products", nargs="+", help="商品名（默认全部支持实时行情的商品）")
+    quotes_parser.add_argument("--interval", type=float, default=30, help="轮询间隔秒数（默认30）")
+    quotes_parser.add_argument("--count", type=int, default=1, help="轮询次数（默认1）")
+    quotes_parser.add_argument("--fake", action="store_true", help="使用本地模拟行情（从最新收盘价随机游走）")
+    add_store_args(quotes_parser)
+    
+    benchmark_parser = subparsers.add_parser("benchmark", help="用模拟数据测量分析各步骤在不同规模下的耗时和峰值内存")
+    benchmark_parser.add_argument("--sizes", nargs="+", default=["10x250", "50x1000", "100x2500"],
+                                  help="数据规模，商品数x交易日数（默认10x250 50x1000 100x2500）")
+    benchmark_parser.add_argument("--repeat", type=int, default=3, help="每个步骤重复次数，取最佳耗时（默认3）")
+    benchmark_parser.add_argument("--baseline", help="基线结果CSV（之前用-o保存），最佳耗时超出容差时返回非零退出码")
+    benchmark_parser.add_argument("--tolerance", type=float, default=0.25, help="相对基线允许变慢的比例（默认0.25）")
+    add_output_args(benchmark_parser)
+    
+    timing_parser = subparsers.add_parser("import-timing", help="测量各重型依赖的导入耗时（启动时间分析）")
+    timing_parser.add_argument("--gui", action="store_true", help="同时测量tkinter和matplotlib TkAgg后端")
+    
+    bench_parser = subparsers.add_parser("bench-parser", help="用保存的页面测试解析器吞吐量（行/秒）")
+    bench_parser.add_argument("pages", nargs="+", help="保存的100ppi页面文件（day-YYYY-MM-DD.html）")
+    bench_parser.add_argument("--repeat", type=int, default=20, help="每个页面重复解析次数")
+    
+    return parser
+
+def _cli_progress(progress, message):
+    """命令行进度输出（输出到标准错误，不影响结果输出）"""
+    print(f"[{progress:5.1f}%] {message}", file=sys.stderr)
+
+def _cli_fetch_to_store(start_date, end_date, store, workers, use_cache=True, save_html=None):
+    fetcher = create_default_fetcher(use_cache=use_cache, max_workers=workers)
+    if save_html:
+        os.makedirs(save_html, exist_ok=True)
+        fetcher.raw_html_dir = save_html
+    data = fetcher.get_future_data(start_date, end_date, _cli_progress)
+    if data is None:
+        print("数据获取失败", file=sys.stderr)
+        return None
+    
+    stats = fetcher.last_fetch_stats
+    print(f"共{len(data)}条记录（缓存{stats['cached']}天，网络获取{stats['fetched']}天，"
+          f"跳过非交易日{stats['skipped']}天，失败{stats['failed']}天）", file=sys.stderr)
+    if fetcher.last_failed_dates:
+        print(f"网络错误导致获取失败的日期: {', '.join(fetcher.last_failed_dates)}", file=sys.stderr)
+    written = store.append(data)
+    if written:
+        print(f"已写入本地数据库分区: {', '.join(written)}", file=sys.stderr)
+    return data
+
+def _cli_load_data(args, store):
+    if getattr(args, "input", None):
+        if args.input.lower().endswith(".parquet"):
+            data = pd.read_parquet(args.input)
+        else:
+            data = pd.read_csv(args.input, encoding='utf-8-sig')
+        normalize_future_data(data)
+        if getattr(args, "start", None):
+            data = data[data["日期"] >= pd.Timestamp(args.start)]
+        if getattr(args, "end", None):
+            data = data[data["日期"] <= pd.Timestamp(args.end)]
+        return data.reset_index(drop=True)
+    return store.load(getattr(args, "start", None), getattr(args, "end", None))
+
+def _cli_write_scan(scan, args):
+    scan = scan.drop(columns=["颜色"], errors="ignore")
+    output_format = args.format
+    if output_format is None:
+        output_format = "json" if args.output and args.output.lower().endswith(".json") else "csv"
+    
+    if output_format == "json":
+        text = scan.to_json(orient="records", force_ascii=False, date_format="iso", indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            print(text)
+    elif args.output:
+        scan.to_csv(args.output, index=False, encoding='utf-8-sig')
+    else:
+        scan.to_csv(sys.stdout, index=False)
+    
+    if args.output:
+        print(f"扫描结果已保存到: {args.output}", file=sys.stderr)
+
+def _cli_scan(args, store, analyzer=None):
+    """扫描全部商品；未提供analyzer时从输入文件或本地数据库读取数据"""
+    if analyzer is None:
+        data = _cli_load_data(args, store)
+        if data is None or data.empty:
+            print("没有可分析的数据", file=sys.stderr)
+            return 1
+        analyzer = FutureDataAnalyzer()
+        analyzer.set_data(data)
+    elif analyzer.data is None or analyzer.data.empty:
+        print("没有可分析的数据", file=sys.stderr)
+        return 1
+    
+    scan = analyzer.batch_scan()
+    _cli_write_scan(scan, args)
+    
+    if args.alerts:
+        engine = AlertRuleEngine(args.rules, args.alert_log)
+        alerts = engine.run(scan, analyzer.indicator_scan())
+        for name, error in engine.rule_errors.items():
+            print(f"预警规则'{name}'无法求值: {error}", file=sys.stderr)
+        if not alerts.empty:
+            print(f"触发{len(alerts)}条预警（已记录到{engine.log_path}）:", file=sys.stderr)
+            print(engine.describe(alerts), file=sys.stderr)
+    return 0
+
+def _cli_indicators(args, store):
+    data = _cli_load_data(args, store)
+    if data is None or data.empty:
+        print("没有可分析的数据", file=sys.stderr)
+        return 1
+    
+    analyzer = FutureDataAnalyzer()
+    analyzer.set_data(data)
+    result = analyzer.get_indicators() if args.history else analyzer.indicator_scan()
+    _cli_write_scan(result, args)
+    return 0
+
+def _cli_quotes(args, store):
+    """轮询实时行情，每次输出各商品的最新价、涨跌幅和在历史价格中的百分位"""
+    data = _cli_load_data(args, store)
+    if data is None or data.empty:
+        print("没有可分析的历史数据", file=sys.stderr)
+        return 1
+    
+    analyzer = FutureDataAnalyzer()
+    analyzer.set_data(data)
+    products = args.products or analyzer.get_available_products()
+    
+    if args.fake:
+        scan = analyzer.batch_scan().set_index("商品")
+        provider = FakeQuoteProvider(scan["当前价格"].dropna().to_dict())
+    else:
+        provider = SinaFuturesQuoteProvider(session=create_default_fetcher(use_cache=False).session)
+    products = [p for p in products if provider.supports(p)]
+    if not products:
+        print(f"{provider.name}不支持所选商品", file=sys.stderr)
+        return 1
+    
+    def print_quotes(quotes):
+        for product, quote in quotes.items():
+            position = analyzer.quote_position(product, quote["price"])
+            if position is None:
+                continue
+            change = f"{position['change_pct']:+.2f}%" if position["change_pct"] is not None else "N/A"
+            print(f"{quote['time']} {product}: {quote['price']:.2f} ({change}) "
+                  f"百分位 {position['percentile']:.1f}% - {position['status']}")
+        sys.stdout.flush()
+    
+    poller = QuotePoller(provider, products, args.interval, on_quotes=print_quotes)
+    for i in range(max(args.count, 1)):
+        if i:
+            time.sleep(args.interval)
+        try:
+            poller.poll_once()
+        except Exception as e:
+            print(f"获取实时行情失败: {e}", file=sys.stderr)
+    return 0
+
+def _cli_benchmark(args):
+    sizes = []
+    for size in args.sizes:
+        match = re.fullmatch(r"(\d+)[xX×*](\d+)", size)
+        if not match:
+            print(f"规模格式错误: {size}（应为 商品数x交易日数，如50x1000）", file=sys.stderr)
+            return 2
+        sizes.append((int(match.group(1)), int(match.group(2))))
+    
+    result = run_analyzer_benchmark(sizes, repeat=max(args.repeat, 1),
+                                    progress=lambda message: print(f"正在测试: {message}", file=sys.stderr))
+    
+    if args.output:
+        _cli_write_scan(result, args)
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.unicode.east_asian_width", True):
+        print(result.drop(columns=["商品数", "交易日数"]).to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    
+    if args.baseline:
+        slower = compare_benchmark(result, pd.read_csv(args.baseline, encoding='utf-8-sig'), args.tolerance)
+        if not slower.empty:
+            print(f"\n以下步骤比基线慢{args.tolerance:.0%}以上:", file=sys.stderr)
+            for row in slower.itertuples(index=False):
+                print(f"  {row.规模} {row.步骤}: {row.最佳耗时ms_基线:.2f}ms -> {row.最佳耗时ms:.2f}ms ({row.变化:+.0%})",
+                      file=sys.stderr)
+            return 1
+        print("\n与基线相比没有明显变慢的步骤", file=sys.stderr)
+    return 0
+
+def _cli_import_timing(args):
+    """按图形界面启动时的顺序导入各依赖并输出耗时（在新进程中运行结果才准确）"""
+    start = time.perf_counter()
+    preload_modules(extra=("matplotlib", "matplotlib.figure", "matplotlib.dates", "scipy.stats"))
+    if args.gui:
+        try:
+            load_gui_modules()
+        except ImportError as e:
+            print(f"无法导入图形界面模块: {e}", file=sys.stderr)
+    total = time.perf_counter() - start
+    
+    already_loaded = [name for name, seconds in IMPORT_TIMINGS.items() if seconds < 0.0005]
+    for name, seconds in IMPORT_TIMINGS.items():
+        print(f"{name:<24}{seconds * 1000:10.1f} ms")
+    print(f"{'合计':<22}{total * 1000:10.1f} ms")
+    if already_loaded:
+        print(f"（已被之前的模块导入: {', '.join(already_loaded)}）", file=sys.stderr)
+    return 0
+
+def _cli_bench_parser(args):
+    """解析器基准测试：输出每个页面及总体的解析吞吐量"""
+    parser = FutureDayParser()
+    total_rows = 0
+    total_seconds = 0.0
+    
+    for path in args.pages:
+        with open(path, "rb") as f:
+            content = f.read()
+        match = re.search(r"\d{4}-\d{2}-\d{2}", os.path.basename(path))
+        date_str = match.group(0) if match else ""
+        
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            rows = parser.parse(content, date_str)
+        elapsed = time.perf_counter() - start
+        
+        total_rows += len(rows) * args.repeat
+        total_seconds += elapsed
+        rate = len(rows) * args.repeat / elapsed if elapsed > 0 else 0
+        print(f"{os.path.basename(path)}: {len(rows)}行, 每次{elapsed / args.repeat * 1000:.2f}ms, {rate:,.0f}行/秒")
+    
+    if total_seconds > 0:
+        print(f"合计: {total_rows}行, {total_seconds:.3f}秒, {total_rows / total_seconds:,.0f}行/秒")
+    return 0
+
+def run_cli(argv):
+    """命令行入口，返回进程退出码"""
+    args = build_arg_parser().parse_args(argv)
+    if args.command == "bench-parser":
+        return _cli_bench_parser(args)
+    if args.command == "import-timing":
+        return _cli_import_timing(args)
+    if args.command == "benchmark":
+        return _cli_benchmark(args)
+    
+    store = FutureDataStore(args.store)
+    
+    if args.command == "fetch":
+        data = _cli_fetch_to_store(args.start, args.end, store, args.workers,
+                                   use_cache=not args.no_cache, save_html=args.save_html)
+        return 0 if data is not None else 1
+    
+    if args.command == "scan":
+        return _cli_scan(args, store)
+    
+    if args.command == "indicators":
+        return _cli_indicators(args, store)
+    
+    if args.command == "quotes":
+        return _cli_quotes(args, store)
+    
+    if args.command == "update":
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=max(args.days, 1) - 1)
+        # 先读取已有历史，新获取的数据直接追加，不再重新读取整个数据库
+        analyzer = FutureDataAnalyzer()
+        analyzer.set_data(store.load())
+        data = _cli_fetch_to_store(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"),
+                                   store, args.workers)
+        if data is None:
+            return 1
+        added = analyzer.append_data(data)
+        print(f"新增{added}条记录", file=sys.stderr)
+        return _cli_scan(args, store, analyzer)
+    
+    return 1
+
 # ========== 程序入口 ==========
-if __name__ == "__main__":
+def main(argv=None):
+    """带参数时运行命令行模式，否则启动图形界面"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_cli(argv)
+    
+    load_tk_modules()
     root = tk.Tk()
     app = FutureAnalysisApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.stop_quotes()
+    app.analysis_worker.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,13 +2,185 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 import threading
 import time
 import json
 import re
 import queue
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+class SourceHealth:
+    """
+    单个数据源的健康状态：成功率和耗时的指数加权平均（EWMA）+ 熔断器
+    连续失败failure_threshold次后熔断（open），open_seconds秒内不再请求；
+    之后进入半开（half_open）状态，只放行一个探测请求，成功则恢复正常（closed），失败则重新熔断
+    """
+    # 只有这些状态说明数据源本身不可用：网络错误（连接、超时）、请求失败（HTTP状态码）、数据格式错误（响应不是该接口的格式）；
+    # 响应格式正确但某个基金的内容为空或无法解析（如fundgz对没有估值的基金返回空的jsonpgz();）只与单个基金有关，不计入失败
+    FAILURE_STATUSES = ('网络错误', '请求失败', '数据格式错误')
+    STATE_NAMES = {'closed': '正常', 'open': '熔断', 'half_open': '探测中'}
+    
+    def __init__(self, failure_threshold=3, open_seconds=60, alpha=0.2,
+                 degraded_success_rate=0.8, slow_latency=3.0):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.alpha = alpha
+        self.degraded_success_rate = degraded_success_rate
+        self.slow_latency = slow_latency
+        
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.probing = False
+        self.consecutive_failures = 0
+        self.success_rate = 1.0
+        self.latency = None
+        self.last_request_at = 0.0
+        self.requests = 0
+        self.failures = 0
+    
+    def available(self):
+        """当前是否可以请求（熔断中且未到探测时间、或探测请求尚未返回时不可请求）"""
+        with self.lock:
+            if self.state == 'open':
+                return time.monotonic() - self.opened_at >= self.open_seconds
+            if self.state == 'half_open':
+                return not self.probing
+            return True
+    
+    def acquire(self):
+        """发送请求前调用：熔断到期时转为半开并占用唯一的探测名额，返回是否可以请求"""
+        with self.lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = 'half_open'
+                self.probing = False
+            if self.state == 'half_open':
+                if self.probing:
+                    return False
+                self.probing = True
+            return True
+    
+    def record(self, success, latency=None):
+        """记录一次请求结果，更新成功率、耗时EWMA和熔断状态"""
+        with self.lock:
+            self.requests += 1
+            self.last_request_at = time.monotonic()
+            self.success_rate += self.alpha * ((1.0 if success else 0.0) - self.success_rate)
+            if latency is not None:
+                self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+            
+            if success:
+                self.consecutive_failures = 0
+                self.state = 'closed'
+            else:
+                self.failures += 1
+                self.consecutive_failures += 1
+                if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                    self.state = 'open'
+                    self.opened_at = time.monotonic()
+            self.probing = False
+    
+    @property
+    def degraded(self):
+        """成功率偏低或耗时过长（排序时放到健康的数据源之后）"""
+        return self.success_rate < self.degraded_success_rate or (self.latency or 0) > self.slow_latency
+    
+    @property
+    def probe_due(self):
+        """降级的数据源排在后面后很少再被请求，每open_seconds秒按原优先级请求一次，使其有机会恢复"""
+        return self.degraded and time.monotonic() - self.last_request_at >= self.open_seconds
+    
+    def describe(self):
+        """状态描述：状态、成功率、耗时EWMA和请求次数"""
+        with self.lock:
+            state = self.STATE_NAMES[self.state]
+            if self.state == 'open':
+                remaining = max(0, self.open_seconds - (time.monotonic() - self.opened_at))
+                state += f"（{remaining:.0f}秒后探测）"
+            elif self.state == 'closed' and self.degraded:
+                state = "降级"
+            latency = f"{self.latency * 1000:.0f}ms" if self.latency is not None else "-"
+            return (f"{state} | 成功率{self.success_rate:.0%} | 耗时EWMA {latency} | "
+                    f"请求{self.requests}次, 失败{self.failures}次")
+
+
+class LayeredCache:
+    """
+    分层缓存：每个(基金代码, 数据类型)条目独立记录写入时间（单调时钟，不受系统时间调整影响），按数据类型的TTL判断是否新鲜
+    过期后stale_ttls秒内仍可作为旧数据返回（由调用方在后台刷新或在网络失败时兜底），超过后删除；
+    条目数超过max_entries时淘汰最久未使用的条目
+    """
+    def __init__(self, ttls, stale_ttls=None, max_entries=600, clock=time.monotonic):
+        self.ttls = ttls
+        self.stale_ttls = stale_ttls or {}
+        self.max_entries = max_entries
+        self.clock = clock
+        
+        self.entries = OrderedDict()  # (代码, 数据类型) -> (写入时间, 数据)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.evictions = 0
+    
+    def _stats(self, data_type):
+        return self.stats.setdefault(data_type, {'hits': 0, 'stale_hits': 0, 'misses': 0})
+    
+    def get(self, code, data_type, allow_stale=False):
+        """返回(数据, 是否新鲜)；没有可用数据时返回(None, False)，allow_stale为True时也返回过期不久的旧数据"""
+        key = (code, data_type)
+        with self.lock:
+            stats = self._stats(data_type)
+            entry = self.entries.get(key)
+            if entry is not None:
+                written_at, data = entry
+                age = self.clock() - written_at
+                ttl = self.ttls[data_type]
+                if age <= ttl:
+                    self.entries.move_to_end(key)
+                    stats['hits'] += 1
+                    return data, True
+                if age > ttl + self.stale_ttls.get(data_type, 0):
+                    del self.entries[key]
+                elif allow_stale:
+                    self.entries.move_to_end(key)
+                    stats['stale_hits'] += 1
+                    return data, False
+            stats['misses'] += 1
+            return None, False
+    
+    def is_fresh(self, code, data_type):
+        """是否有未过期的数据（不计入命中统计）"""
+        with self.lock:
+            entry = self.entries.get((code, data_type))
+            return entry is not None and self.clock() - entry[0] <= self.ttls[data_type]
+    
+    def set(self, code, data_type, data):
+        """写入数据，只刷新该条目的写入时间"""
+        key = (code, data_type)
+        with self.lock:
+            self.entries[key] = (self.clock(), data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+    
+    def code_count(self):
+        """缓存中的基金数"""
+        with self.lock:
+            return len({code for code, _ in self.entries})
+    
+    def describe(self, data_type):
+        """该数据类型的命中、旧数据命中、未命中次数和命中率"""
+        with self.lock:
+            stats = dict(self._stats(data_type))
+        total = stats['hits'] + stats['stale_hits'] + stats['misses']
+        rate = (stats['hits'] + stats['stale_hits']) / total if total else 0
+        return f"命中{stats['hits']}次, 旧数据{stats['stale_hits']}次, 未命中{stats['misses']}次, 命中率{rate:.0%}"
+
 
 class LOFMonitorApp:
     def __init__(self, root):
@@ -16,17 +188,34 @@ class LOFMonitorApp:
         self.root.title("LOF溢价率监控工具 - 智能数据融合优化版")
         self.root.geometry("1300x750")
         
-        # 会话对象
+        # 会话对象：所有数据源共用，连接池按主机复用长连接（跨监控周期保持）；
+        # 请求实际在对冲线程池中发出，每个主机的连接数与对冲线程数一致，避免并发请求超出连接池后频繁新建连接
+        self.fetch_workers = 10
+        self.hedge_workers = self.fetch_workers * 2
         self.session = requests.Session()
+        self.http_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.hedge_workers)
+        self.session.mount('http://', self.http_adapter)
+        self.session.mount('https://', self.http_adapter)
         self._init_session_headers()
         
-        # 缓存最近数据
-        self.data_cache = {}
+        # 各数据源的请求统计（次数、失败数、耗时），在数据源状态中显示
+        self.source_stats = {}
+        self.stats_lock = threading.Lock()
+        
+        # 缓存最近数据：价格、净值、完整数据分别计时
         self.cache_expiry = {
             'price': 300,  # 价格缓存5分钟
             'nav': 3600,   # 净值缓存1小时
             'full': 600    # 完整数据缓存10分钟
         }
+        # 过期后仍可使用的时间：完整数据过期10分钟内先显示旧数据并在后台刷新，价格和净值在所有数据源失败时兜底
+        self.cache_stale = {
+            'price': 1800,
+            'nav': 86400,
+            'full': 600
+        }
+        self.cache = LayeredCache(self.cache_expiry, self.cache_stale, max_entries=600)
+        self.revalidating = set()
         
         # 线程控制
         self.monitoring = False
@@ -46,11 +235,42 @@ class LOFMonitorApp:
             'nav': [
                 ('eastmoney', '东方财富净值', 1),  # 最高优先级
                 ('eastmoney_history', '东方财富历史净值', 2),
-                ('tencent', '腾讯财经净值', 3),
                 ('cached', '缓存数据', 4)
             ]
         }
         
+        # 各数据源的获取函数（'cached'等没有获取函数的数据源单独处理）
+        self.source_fetchers = {
+            'price': {
+                'tencent': self._get_price_from_tencent,
+                'sina': self._get_price_from_sina,
+            },
+            'nav': {
+                'eastmoney': self._get_nav_from_eastmoney,
+                'eastmoney_history': self._get_historical_nav_from_eastmoney,
+            }
+        }
+        
+        # 对冲请求：高优先级数据源超过hedge_delay秒（或其近期耗时的p95，取较小值）仍未返回时，
+        # 并行请求下一个数据源，采用最先返回的有效结果；hedge_requests为False时按优先级依次请求
+        self.hedge_requests = True
+        self.hedge_delay = 1.0
+        self.source_latencies = {}
+        self.hedge_executor = ThreadPoolExecutor(max_workers=self.hedge_workers)
+        
+        # 数据源健康状态和熔断器：连续失败3次后熔断60秒，之后放行一个探测请求；
+        # 实际请求顺序在data_sources优先级的基础上动态调整（降级的数据源排在健康的之后，熔断的跳过）
+        self.breaker_failure_threshold = 3
+        self.breaker_open_seconds = 60
+        self.source_health = {}
+        
+        # 批量行情：一次请求包含的基金代码数（腾讯、新浪行情接口支持逗号分隔的多个代码）
+        self.quote_batch_size = 50
+        self.batch_price_sources = {
+            'tencent': self._get_prices_batch_from_tencent,
+            'sina': self._get_prices_batch_from_sina,
+        }
+        
         # 监控的LOF基金列表
         self.lof_codes = [
             "161226",  # 国投白银LOF
@@ -87,32 +307,35 @@ class LOFMonitorApp:
         }
         self.session.headers.update(headers)
     
-    def _get_cached_data(self, code, data_type):
-        """获取缓存数据"""
-        if code in self.data_cache:
-            cache_entry = self.data_cache[code]
-            cache_time = cache_entry.get('timestamp', 0)
-            current_time = time.time()
-            
-            # 检查缓存是否过期
-            if data_type == 'price':
-                expiry = self.cache_expiry['price']
-            elif data_type == 'nav':
-                expiry = self.cache_expiry['nav']
-            else:
-                expiry = self.cache_expiry['full']
-            
-            if current_time - cache_time <= expiry:
-                return cache_entry.get(data_type, {})
-        return None
+    def _request(self, source, url, headers=None, timeout=5):
+        """通过共享会话发送GET请求，并记录该数据源的请求次数、失败数和耗时"""
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.get(url, headers=headers, timeout=timeout)
+            failed = response.status_code != 200
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.stats_lock:
+                stats = self.source_stats.setdefault(source, {
+                    'requests': 0, 'failures': 0, 'total_time': 0.0, 'last_time': 0.0, 'max_time': 0.0
+                })
+                stats['requests'] += 1
+                stats['failures'] += failed
+                stats['total_time'] += elapsed
+                stats['last_time'] = elapsed
+                stats['max_time'] = max(stats['max_time'], elapsed)
     
-    def _update_cache(self, code, data_type, data):
-        """更新缓存"""
-        if code not in self.data_cache:
-            self.data_cache[code] = {'timestamp': time.time()}
-        
-        self.data_cache[code][data_type] = data
-        self.data_cache[code]['timestamp'] = time.time()
+    def _connection_pool_stats(self):
+        """返回各主机连接池的(主机, 新建连接数, 请求数)，新建连接数远小于请求数说明长连接被复用"""
+        pools = self.http_adapter.poolmanager.pools
+        result = []
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                result.append((f"{pool.scheme}://{pool.host}", pool.num_connections, pool.num_requests))
+        return result
     
     def _process_task_queue(self):
         """处理任务队列的独立线程"""
@@ -286,25 +509,110 @@ class LOFMonitorApp:
     
     # =============== 数据获取函数 ===============
     
+    def _market_prefix(self, code):
+        """根据基金代码确定市场前缀"""
+        if code.startswith('16') or code.startswith('15'):
+            return 'sz'
+        elif code.startswith('50') or code.startswith('51'):
+            return 'sh'
+        return 'sz'
+    
+    def _parse_tencent_quote(self, code, data_str):
+        """解析腾讯行情字段（~分隔）"""
+        data = data_str.split('~')
+        
+        if len(data) < 40:
+            return None, "数据不完整"
+        
+        # 获取价格和相关信息
+        current_price = data[3]
+        change_percent = data[32] if len(data) > 32 else "0.00"
+        volume = data[6] if len(data) > 6 else "0"
+        name = data[1] if len(data) > 1 else f"基金{code}"
+        
+        # 处理价格
+        try:
+            price = float(current_price) if current_price else 0
+        except:
+            price = 0
+        
+        if price <= 0:
+            return None, "价格无效"
+        
+        # 处理涨跌幅
+        if change_percent and change_percent.strip():
+            try:
+                if not change_percent.endswith('%'):
+                    change_percent = f"{float(change_percent):.2f}%"
+            except:
+                change_percent = "0.00%"
+        else:
+            change_percent = "0.00%"
+        
+        # 处理成交量
+        try:
+            volume_wan = float(volume) / 10000 if volume else 0
+        except:
+            volume_wan = 0
+        
+        result = {
+            'price': price,
+            'change_percent': change_percent,
+            'volume': volume_wan,
+            'name': name,
+            'source': '腾讯财经',
+            'timestamp': time.time()
+        }
+        
+        return result, "成功"
+    
+    def _parse_sina_quote(self, code, data_str):
+        """解析新浪行情字段（,分隔）"""
+        data = data_str.split(',')
+        
+        if len(data) < 30:
+            return None, "数据不完整"
+        
+        # 获取价格
+        try:
+            price = float(data[3]) if data[3] else 0
+            prev_close = float(data[2]) if data[2] else price
+        except:
+            price = 0
+            prev_close = 0
+        
+        if price <= 0:
+            return None, "价格无效"
+        
+        # 计算涨跌幅
+        if prev_close > 0:
+            change_pct = (price - prev_close) / prev_close * 100
+            change_percent = f"{change_pct:.2f}%"
+        else:
+            change_percent = "0.00%"
+        
+        result = {
+            'price': price,
+            'change_percent': change_percent,
+            'volume': 0,  # 新浪不提供成交量
+            'name': data[0] if data[0] else f"基金{code}",
+            'source': '新浪财经',
+            'timestamp': time.time()
+        }
+        
+        return result, "成功"
+    
     def _get_price_from_tencent(self, code):
         """从腾讯财经获取实时价格"""
         try:
-            # 确定市场前缀
-            if code.startswith('16') or code.startswith('15'):
-                prefix = 'sz'
-            elif code.startswith('50') or code.startswith('51'):
-                prefix = 'sh'
-            else:
-                prefix = 'sz'
-            
-            url = f"http://qt.gtimg.cn/q={prefix}{code}"
+            url = f"http://qt.gtimg.cn/q={self._market_prefix(code)}{code}"
             
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
                 'Referer': 'https://gu.qq.com/',
             }
             
-            response = requests.get(url, headers=headers, timeout=5)
+            response = self._request('腾讯财经', url, headers=headers, timeout=5)
             
             if response.status_code != 200:
                 return None, "请求失败"
@@ -316,52 +624,7 @@ class LOFMonitorApp:
                 return None, "数据格式错误"
             
             data_str = text.split('="')[1].split('";')[0]
-            data = data_str.split('~')
-            
-            if len(data) < 40:
-                return None, "数据不完整"
-            
-            # 获取价格和相关信息
-            current_price = data[3]
-            change_percent = data[32] if len(data) > 32 else "0.00"
-            volume = data[6] if len(data) > 6 else "0"
-            name = data[1] if len(data) > 1 else f"基金{code}"
-            
-            # 处理价格
-            try:
-                price = float(current_price) if current_price else 0
-            except:
-                price = 0
-            
-            if price <= 0:
-                return None, "价格无效"
-            
-            # 处理涨跌幅
-            if change_percent and change_percent.strip():
-                try:
-                    if not change_percent.endswith('%'):
-                        change_percent = f"{float(change_percent):.2f}%"
-                except:
-                    change_percent = "0.00%"
-            else:
-                change_percent = "0.00%"
-            
-            # 处理成交量
-            try:
-                volume_wan = float(volume) / 10000 if volume else 0
-            except:
-                volume_wan = 0
-            
-            result = {
-                'price': price,
-                'change_percent': change_percent,
-                'volume': volume_wan,
-                'name': name,
-                'source': '腾讯财经',
-                'timestamp': time.time()
-            }
-            
-            return result, "成功"
+            return self._parse_tencent_quote(code, data_str)
                 
         except requests.exceptions.RequestException:
             return None, "网络错误"
@@ -371,22 +634,14 @@ class LOFMonitorApp:
     def _get_price_from_sina(self, code):
         """从新浪财经获取实时价格（备用）"""
         try:
-            # 确定市场
-            if code.startswith('16') or code.startswith('15'):
-                market = 'sz'
-            elif code.startswith('50') or code.startswith('51'):
-                market = 'sh'
-            else:
-                market = 'sz'
-            
-            url = f"http://hq.sinajs.cn/list={market}{code}"
+            url = f"http://hq.sinajs.cn/list={self._market_prefix(code)}{code}"
             
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
                 'Referer': 'http://finance.sina.com.cn/',
             }
             
-            response = requests.get(url, headers=headers, timeout=5)
+            response = self._request('新浪财经', url, headers=headers, timeout=5)
             
             if response.status_code != 200:
                 return None, "请求失败"
@@ -398,45 +653,128 @@ class LOFMonitorApp:
                 return None, "数据格式错误"
             
             data_str = text.split('="')[1].split('";')[0]
-            data = data_str.split(',')
-            
-            if len(data) < 30:
-                return None, "数据不完整"
-            
-            # 获取价格
-            try:
-                price = float(data[3]) if data[3] else 0
-                prev_close = float(data[2]) if data[2] else price
-            except:
-                price = 0
-                prev_close = 0
-            
-            if price <= 0:
-                return None, "价格无效"
-            
-            # 计算涨跌幅
-            if prev_close > 0:
-                change_pct = (price - prev_close) / prev_close * 100
-                change_percent = f"{change_pct:.2f}%"
-            else:
-                change_percent = "0.00%"
-            
-            result = {
-                'price': price,
-                'change_percent': change_percent,
-                'volume': 0,  # 新浪不提供成交量
-                'name': data[0] if data[0] else f"基金{code}",
-                'source': '新浪财经',
-                'timestamp': time.time()
-            }
-            
-            return result, "成功"
+            return self._parse_sina_quote(code, data_str)
                 
         except requests.exceptions.RequestException:
             return None, "网络错误"
         except Exception:
             return None, "处理错误"
     
+    def _get_prices_batch(self, source, codes, url_template, headers, line_pattern, parse_func):
+        """
+        分批请求多个基金的实时价格（每次最多quote_batch_size个代码），解析多行响应
+        返回 {代码: 价格数据}，请求失败或解析失败的代码不返回（由调用方逐个回退）
+        """
+        results = {}
+        for i in range(0, len(codes), self.quote_batch_size):
+            chunk = codes[i:i + self.quote_batch_size]
+            symbols = ",".join(f"{self._market_prefix(code)}{code}" for code in chunk)
+            try:
+                response = self._request(source, url_template.format(symbols), headers=headers, timeout=5)
+                if response.status_code != 200:
+                    continue
+                
+                for code, data_str in line_pattern.findall(response.text):
+                    if code not in chunk:
+                        continue
+                    try:
+                        price_data, status = parse_func(code, data_str)
+                    except Exception:
+                        continue
+                    if price_data:
+                        results[code] = price_data
+            except requests.exceptions.RequestException as e:
+                print(f"批量行情请求失败({len(chunk)}个代码): {e}")
+        return results
+    
+    def _get_prices_batch_from_tencent(self, codes):
+        """从腾讯财经批量获取实时价格，响应每行格式: v_sz161226="...";"""
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Referer': 'https://gu.qq.com/',
+        }
+        return self._get_prices_batch('腾讯财经', codes, "http://qt.gtimg.cn/q={}", headers,
+                                      re.compile(r'v_s[hz](\d{6})="([^"]*)"'), self._parse_tencent_quote)
+    
+    def _get_prices_batch_from_sina(self, codes):
+        """从新浪财经批量获取实时价格，响应每行格式: var hq_str_sz161226="...";"""
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Referer': 'http://finance.sina.com.cn/',
+        }
+        return self._get_prices_batch('新浪财经', codes, "http://hq.sinajs.cn/list={}", headers,
+                                      re.compile(r'hq_str_s[hz](\d{6})="([^"]*)"'), self._parse_sina_quote)
+    
+    def _fetch_batch(self, source_id, batch_func, codes):
+        """执行一个数据源的批量请求并记录健康状态：批量请求包含多个分批，耗时不计入EWMA；一个代码也没有返回视为数据源失败"""
+        batch_result = {}
+        try:
+            batch_result = batch_func(codes)
+            return batch_result
+        finally:
+            self._source_health('price', source_id).record(bool(batch_result))
+    
+    def fetch_batch_prices(self, codes):
+        """
+        按价格数据源优先级批量获取实时价格：前一个数据源未返回的代码交给下一个支持批量的数据源
+        对冲模式下与_fetch_from_sources相同：高优先级数据源超过对冲延迟未返回时并行请求下一个数据源，
+        采用最先返回的非空结果，不再等待卡住的数据源超时
+        返回 {代码: (价格数据, 数据源名称)}，仍缺失的代码在fetch_single_fund_data中逐个回退
+        """
+        batch_sources = [(source_id, source_name, self.batch_price_sources[source_id])
+                         for source_id, source_name in self._ordered_sources('price')
+                         if source_id in self.batch_price_sources]
+        prices = {}
+        
+        if not self.hedge_requests:
+            for source_id, source_name, batch_func in batch_sources:
+                remaining = [code for code in codes if code not in prices]
+                if not remaining:
+                    break
+                if not self._source_health('price', source_id).acquire():
+                    continue
+                for code, price_data in self._fetch_batch(source_id, batch_func, remaining).items():
+                    prices[code] = (price_data, source_name)
+            return prices
+        
+        running = []
+        next_index = 0
+        while True:
+            timeout = None
+            remaining = [code for code in codes if code not in prices]
+            while next_index < len(batch_sources) and remaining:
+                source_id, source_name, batch_func = batch_sources[next_index]
+                next_index += 1
+                if not self._source_health('price', source_id).acquire():
+                    continue
+                future = self.hedge_executor.submit(self._fetch_batch, source_id, batch_func, remaining)
+                running.append((future, source_name))
+                if next_index < len(batch_sources):
+                    timeout = self._hedge_delay('price', source_id)
+                break
+            
+            if not running:
+                return prices
+            
+            done, _ = wait([future for future, _ in running], timeout=timeout, return_when=FIRST_COMPLETED)
+            received = False
+            for future, source_name in list(running):
+                if future not in done:
+                    continue
+                running.remove((future, source_name))
+                try:
+                    batch_result = future.result()
+                except Exception:
+                    continue
+                for code, price_data in batch_result.items():
+                    if code not in prices:
+                        prices[code] = (price_data, source_name)
+                        received = True
+            
+            # 已有非空结果时不再等待仍未返回的数据源，缺失的代码逐个回退；没有仍在进行的请求时继续请求下一个数据源补齐
+            if all(code in prices for code in codes) or (received and running):
+                return prices
+    
     def _get_nav_from_eastmoney(self, code):
         """从东方财富获取净值"""
         try:
@@ -448,7 +786,7 @@ class LOFMonitorApp:
                 'Referer': 'https://fund.eastmoney.com/',
             }
             
-            response = requests.get(url, headers=headers, timeout=8)
+            response = self._request('东方财富', url, headers=headers, timeout=8)
             
             if response.status_code != 200:
                 return None, "请求失败"
@@ -459,8 +797,10 @@ class LOFMonitorApp:
             if not text.startswith('jsonpgz(') or not text.endswith(');'):
                 return None, "数据格式错误"
             
-            # 提取JSON部分
+            # 提取JSON部分（没有估值的基金，如QDII，返回空的jsonpgz();）
             json_str = text[8:-2]
+            if not json_str.strip():
+                return None, "无估值数据"
             
             try:
                 data = json.loads(json_str)
@@ -511,13 +851,18 @@ class LOFMonitorApp:
                 'Referer': f'https://fundf10.eastmoney.com/jjjz_{code}.html',
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self._request('东方财富(历史)', url, headers=headers, timeout=10)
             
             if response.status_code != 200:
                 return None, "请求失败"
             
-            data = response.json()
+            try:
+                data = response.json()
+            except ValueError:
+                return None, "数据格式错误"
             
+            if not isinstance(data, dict):
+                return None, "数据格式错误"
             if data.get('ErrCode') != 0 or 'Data' not in data or 'LSJZList' not in data['Data']:
                 return None, "数据错误"
             
@@ -552,22 +897,139 @@ class LOFMonitorApp:
         except Exception:
             return None, "处理错误"
     
-    def _get_nav_from_tencent(self, code):
-        """从腾讯财经获取净值（备用）"""
+    def _source_health(self, data_type, source_id):
+        """获取数据源的健康状态（首次使用时创建）"""
+        with self.stats_lock:
+            health = self.source_health.get((data_type, source_id))
+            if health is None:
+                health = SourceHealth(self.breaker_failure_threshold, self.breaker_open_seconds)
+                self.source_health[(data_type, source_id)] = health
+            return health
+    
+    def _ordered_sources(self, data_type):
+        """
+        当前实际的请求顺序[(数据源ID, 名称)]：跳过熔断中的数据源，降级的数据源（成功率低或耗时长）
+        排在健康的之后并按成功率排序，其余保持data_sources中的优先级；只包含能发送网络请求的数据源
+        """
+        candidates = []
+        for source_id, source_name, priority in self.data_sources[data_type]:
+            if source_id not in self.source_fetchers[data_type]:
+                continue
+            health = self._source_health(data_type, source_id)
+            if not health.available():
+                continue
+            degraded = health.state == 'closed' and health.degraded and not health.probe_due
+            candidates.append(((degraded, -health.success_rate if degraded else 0, priority), source_id, source_name))
+        candidates.sort(key=lambda item: item[0])
+        return [(source_id, source_name) for _, source_id, source_name in candidates]
+    
+    def _timed_fetch(self, data_type, source_id, code):
+        """调用数据源的获取函数，记录耗时（用于计算对冲延迟）和健康状态"""
+        start = time.perf_counter()
+        data, status = None, "处理错误"
         try:
-            # 先获取腾讯财经数据
-            price_data, status = self._get_price_from_tencent(code)
-            if price_data is None:
-                return None, "无法获取价格数据"
+            data, status = self.source_fetchers[data_type][source_id](code)
+            return data, status
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.stats_lock:
+                latencies = self.source_latencies.setdefault((data_type, source_id), deque(maxlen=50))
+                latencies.append(elapsed)
+            self._source_health(data_type, source_id).record(status not in SourceHealth.FAILURE_STATUSES, elapsed)
+    
+    def _hedge_delay(self, data_type, source_id):
+        """请求下一个数据源前的等待时间：hedge_delay与该数据源近期耗时p95的较小值（样本不足10个时只用hedge_delay）"""
+        with self.stats_lock:
+            latencies = sorted(self.source_latencies.get((data_type, source_id), ()))
+        if len(latencies) < 10:
+            return self.hedge_delay
+        return min(self.hedge_delay, latencies[int(0.95 * (len(latencies) - 1))])
+    
+    def _fetch_from_sources(self, data_type, code):
+        """
+        按data_sources中的优先级获取价格或净值，返回(数据, 数据源名称, 已尝试的数据源名称列表)
+        对冲模式下高优先级数据源失败或超过对冲延迟未返回时立即请求下一个数据源，
+        采用最先返回的有效结果，同时已有多个有效结果时取优先级最高的
+        """
+        fetchers = self.source_fetchers[data_type]
+        candidates = [(source_id, source_name) for source_id, source_name in self._ordered_sources(data_type)
+                      if source_id in fetchers]
+        tried = []
+        
+        def valid(data):
+            return data is not None and data.get(data_type, 0) > 0
+        
+        if not self.hedge_requests:
+            for source_id, source_name in candidates:
+                if not self._source_health(data_type, source_id).acquire():
+                    continue
+                tried.append(source_name)
+                data, status = self._timed_fetch(data_type, source_id, code)
+                if valid(data):
+                    return data, source_name, tried
+            return None, None, tried
+        
+        running = []
+        next_index = 0
+        while True:
+            timeout = None
+            while next_index < len(candidates):
+                source_id, source_name = candidates[next_index]
+                next_index += 1
+                # 半开状态的数据源只允许一个探测请求，已被其他基金占用时跳过
+                if not self._source_health(data_type, source_id).acquire():
+                    continue
+                tried.append(source_name)
+                future = self.hedge_executor.submit(self._timed_fetch, data_type, source_id, code)
+                running.append((future, source_name))
+                if next_index < len(candidates):
+                    timeout = self._hedge_delay(data_type, source_id)
+                break
             
-            # 腾讯财经数据中没有净值，这里返回None
-            return None, "腾讯财经无净值数据"
-                
-        except Exception:
-            return None, "处理错误"
+            if not running:
+                return None, None, tried
+            
+            # 等待所有未处理的请求：其中任一已完成（如对冲请求先于主请求返回）时立即返回，不会阻塞在慢的数据源上
+            done, _ = wait([future for future, _ in running], timeout=timeout, return_when=FIRST_COMPLETED)
+            for future, source_name in list(running):
+                if future not in done:
+                    continue
+                running.remove((future, source_name))
+                try:
+                    data, status = future.result()
+                except Exception:
+                    continue
+                if valid(data):
+                    return data, source_name, tried
     
-    def fetch_single_fund_data(self, code):
-        """获取单个基金完整数据（智能优先级回退）"""
+    def _revalidate(self, code, batch_price=None):
+        """后台刷新已过期的完整数据缓存（同一基金同时只有一个刷新），完成后更新表格"""
+        with self.stats_lock:
+            if code in self.revalidating:
+                return
+            self.revalidating.add(code)
+        
+        def refresh():
+            try:
+                fund_info = self.fetch_single_fund_data(code, batch_price, use_full_cache=False)
+                for i, fund in enumerate(self.data):
+                    if fund.get('code') == code:
+                        self.data[i] = fund_info
+                self.task_queue.put(('update_table', fund_info))
+            except Exception as e:
+                print(f"基金 {code} 后台刷新失败: {e}")
+            finally:
+                with self.stats_lock:
+                    self.revalidating.discard(code)
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def fetch_single_fund_data(self, code, batch_price=None, use_full_cache=True):
+        """
+        获取单个基金完整数据（智能优先级回退）
+        batch_price为批量行情已取得的(价格数据, 数据源名称)，提供时不再逐个请求价格
+        完整数据缓存过期不久时先返回旧数据并在后台刷新；价格、净值缓存未过期时不发送网络请求
+        """
         fund_info = {
             'code': code,
             'name': f"基金{code}",
@@ -585,58 +1047,56 @@ class LOFMonitorApp:
         }
         
         # 尝试从缓存获取完整数据
-        cached_data = self._get_cached_data(code, 'full')
-        if cached_data:
-            fund_info.update(cached_data)
-            fund_info['data_source'] = '缓存数据'
-            fund_info['sources_used'].append('缓存')
-            return fund_info
+        if use_full_cache:
+            cached_data, fresh = self.cache.get(code, 'full', allow_stale=True)
+            if cached_data:
+                fund_info.update(cached_data)
+                fund_info['data_source'] = '缓存数据' if fresh else '缓存数据(刷新中)'
+                fund_info['sources_used'] = list(cached_data.get('sources_used', [])) + ['缓存']
+                if not fresh:
+                    self._revalidate(code, batch_price)
+                return fund_info
         
         # ========== 获取价格数据 ==========
         price_obtained = False
         price_sources_tried = []
+        price_from_cache = False
         
-        for source_id, source_name, priority in self.data_sources['price']:
-            if price_obtained:
-                break
-                
-            price_sources_tried.append(source_name)
-            
-            if source_id == 'tencent':
-                price_data, status = self._get_price_from_tencent(code)
-                if price_data and price_data.get('price', 0) > 0:
-                    fund_info['price'] = price_data['price']
-                    fund_info['change_percent'] = price_data.get('change_percent', '0.00%')
-                    fund_info['volume'] = price_data.get('volume', 0)
-                    if 'name' in price_data and price_data['name']:
-                        fund_info['name'] = price_data['name']
-                    fund_info['price_source'] = source_name
-                    fund_info['sources_used'].append(f"价格:{source_name}")
-                    price_obtained = True
-                    fund_info['price_status'] = f"{price_data['price']:.3f}"
-            
-            elif source_id == 'sina':
-                price_data, status = self._get_price_from_sina(code)
-                if price_data and price_data.get('price', 0) > 0:
-                    fund_info['price'] = price_data['price']
-                    fund_info['change_percent'] = price_data.get('change_percent', '0.00%')
-                    if 'name' in price_data and price_data['name']:
-                        fund_info['name'] = price_data['name']
-                    fund_info['price_source'] = source_name
-                    fund_info['sources_used'].append(f"价格:{source_name}")
-                    price_obtained = True
-                    fund_info['price_status'] = f"{price_data['price']:.3f}"
-            
-            elif source_id == 'cached':
-                cached_price = self._get_cached_data(code, 'price')
-                if cached_price and cached_price.get('price', 0) > 0:
-                    fund_info['price'] = cached_price['price']
-                    fund_info['change_percent'] = cached_price.get('change_percent', '0.00%')
-                    fund_info['volume'] = cached_price.get('volume', 0)
-                    fund_info['price_source'] = f"{cached_price.get('source', '缓存')}(缓存)"
-                    fund_info['sources_used'].append(f"价格:{source_name}(缓存)")
-                    price_obtained = True
-                    fund_info['price_status'] = f"{cached_price['price']:.3f}(缓存)"
+        cached_price, fresh = self.cache.get(code, 'price')
+        if batch_price is not None:
+            price_data, source_name = batch_price
+            fund_info['sources_used'].append(f"价格:{source_name}(批量)")
+        elif cached_price:
+            price_data, source_name = cached_price, f"{cached_price.get('source', '缓存')}(缓存)"
+            fund_info['sources_used'].append(f"价格:{source_name}")
+            price_from_cache = True
+        else:
+            price_data, source_name, price_sources_tried = self._fetch_from_sources('price', code)
+            if price_data:
+                fund_info['sources_used'].append(f"价格:{source_name}")
+        
+        if price_data:
+            fund_info['price'] = price_data['price']
+            fund_info['change_percent'] = price_data.get('change_percent', '0.00%')
+            fund_info['volume'] = price_data.get('volume', 0)
+            if 'name' in price_data and price_data['name']:
+                fund_info['name'] = price_data['name']
+            fund_info['price_source'] = source_name
+            price_obtained = True
+            fund_info['price_status'] = f"{price_data['price']:.3f}"
+        else:
+            # 所有网络数据源都失败时使用缓存的价格（可以是过期不久的旧数据）
+            cached_price, fresh = self.cache.get(code, 'price', allow_stale=True)
+            price_sources_tried.append('缓存数据')
+            if cached_price and cached_price.get('price', 0) > 0:
+                fund_info['price'] = cached_price['price']
+                fund_info['change_percent'] = cached_price.get('change_percent', '0.00%')
+                fund_info['volume'] = cached_price.get('volume', 0)
+                fund_info['price_source'] = f"{cached_price.get('source', '缓存')}(缓存)"
+                fund_info['sources_used'].append("价格:缓存数据(缓存)")
+                price_obtained = True
+                price_from_cache = True
+                fund_info['price_status'] = f"{cached_price['price']:.3f}(缓存)"
         
         if not price_obtained:
             fund_info['price_status'] = f"缺失(尝试: {', '.join(price_sources_tried)})"
@@ -644,50 +1104,35 @@ class LOFMonitorApp:
         # ========== 获取净值数据 ==========
         nav_obtained = False
         nav_sources_tried = []
+        nav_from_cache = False
         
-        for source_id, source_name, priority in self.data_sources['nav']:
-            if nav_obtained:
-                break
-                
-            nav_sources_tried.append(source_name)
-            
-            if source_id == 'eastmoney':
-                nav_data, status = self._get_nav_from_eastmoney(code)
-                if nav_data and nav_data.get('nav', 0) > 0:
-                    fund_info['nav'] = nav_data['nav']
-                    if 'name' in nav_data and nav_data['name']:
-                        fund_info['name'] = nav_data['name']
-                    fund_info['nav_source'] = source_name
-                    fund_info['sources_used'].append(f"净值:{source_name}")
-                    nav_obtained = True
-                    fund_info['nav_status'] = f"{nav_data['nav']:.3f}"
-            
-            elif source_id == 'eastmoney_history':
-                nav_data, status = self._get_historical_nav_from_eastmoney(code)
-                if nav_data and nav_data.get('nav', 0) > 0:
-                    fund_info['nav'] = nav_data['nav']
-                    fund_info['nav_source'] = source_name
-                    fund_info['sources_used'].append(f"净值:{source_name}")
-                    nav_obtained = True
-                    fund_info['nav_status'] = f"{nav_data['nav']:.3f}(历史)"
-            
-            elif source_id == 'tencent':
-                nav_data, status = self._get_nav_from_tencent(code)
-                if nav_data and nav_data.get('nav', 0) > 0:
-                    fund_info['nav'] = nav_data['nav']
-                    fund_info['nav_source'] = source_name
-                    fund_info['sources_used'].append(f"净值:{source_name}")
-                    nav_obtained = True
-                    fund_info['nav_status'] = f"{nav_data['nav']:.3f}"
-            
-            elif source_id == 'cached':
-                cached_nav = self._get_cached_data(code, 'nav')
-                if cached_nav and cached_nav.get('nav', 0) > 0:
-                    fund_info['nav'] = cached_nav['nav']
-                    fund_info['nav_source'] = f"{cached_nav.get('source', '缓存')}(缓存)"
-                    fund_info['sources_used'].append(f"净值:{source_name}(缓存)")
-                    nav_obtained = True
-                    fund_info['nav_status'] = f"{cached_nav['nav']:.3f}(缓存)"
+        cached_nav, fresh = self.cache.get(code, 'nav')
+        if cached_nav:
+            nav_data, source_name = cached_nav, f"{cached_nav.get('source', '缓存')}(缓存)"
+            nav_from_cache = True
+        else:
+            nav_data, source_name, nav_sources_tried = self._fetch_from_sources('nav', code)
+        if nav_data:
+            fund_info['nav'] = nav_data['nav']
+            # 历史净值接口的name字段为净值日期，不作为基金名称
+            if nav_data.get('source') == '东方财富' and nav_data.get('name'):
+                fund_info['name'] = nav_data['name']
+            fund_info['nav_source'] = source_name
+            fund_info['sources_used'].append(f"净值:{source_name}")
+            nav_obtained = True
+            suffix = "(历史)" if nav_data.get('source') == '东方财富(历史)' else ""
+            fund_info['nav_status'] = f"{nav_data['nav']:.3f}{suffix}"
+        else:
+            # 所有网络数据源都失败时使用缓存的净值（可以是过期不久的旧数据）
+            cached_nav, fresh = self.cache.get(code, 'nav', allow_stale=True)
+            nav_sources_tried.append('缓存数据')
+            if cached_nav and cached_nav.get('nav', 0) > 0:
+                fund_info['nav'] = cached_nav['nav']
+                fund_info['nav_source'] = f"{cached_nav.get('source', '缓存')}(缓存)"
+                fund_info['sources_used'].append("净值:缓存数据(缓存)")
+                nav_obtained = True
+                nav_from_cache = True
+                fund_info['nav_status'] = f"{cached_nav['nav']:.3f}(缓存)"
         
         if not nav_obtained:
             fund_info['nav_status'] = f"缺失(尝试: {', '.join(nav_sources_tried)})"
@@ -725,8 +1170,9 @@ class LOFMonitorApp:
             fund_info['tag'] = 'normal'
         
         # ========== 更新缓存 ==========
-        if price > 0:
-            self._update_cache(code, 'price', {
+        # 只缓存从网络获取的数据，来自缓存的数据不重新写入（否则会不断延长其有效期）
+        if price > 0 and not price_from_cache:
+            self.cache.set(code, 'price', {
                 'price': price,
                 'change_percent': fund_info['change_percent'],
                 'volume': fund_info['volume'],
@@ -734,15 +1180,15 @@ class LOFMonitorApp:
                 'timestamp': time.time()
             })
         
-        if nav > 0:
-            self._update_cache(code, 'nav', {
+        if nav > 0 and not nav_from_cache:
+            self.cache.set(code, 'nav', {
                 'nav': nav,
                 'source': fund_info['nav_source'],
                 'timestamp': time.time()
             })
         
         # 缓存完整数据
-        self._update_cache(code, 'full', fund_info.copy())
+        self.cache.set(code, 'full', fund_info.copy())
         
         # ========== 设置数据源显示 ==========
         if fund_info['price_source'] and fund_info['nav_source']:
@@ -774,13 +1220,19 @@ class LOFMonitorApp:
         def fetch_task():
             try:
                 if self.data_fetch_executor is None:
-                    self.data_fetch_executor = ThreadPoolExecutor(max_workers=10)
+                    self.data_fetch_executor = ThreadPoolExecutor(max_workers=self.fetch_workers)
+                
+                # 先批量获取所有基金的实时价格（完整数据或价格缓存未过期的基金不需要请求）
+                uncached_codes = [code for code in self.lof_codes
+                                  if not self.cache.is_fresh(code, 'full') and not self.cache.is_fresh(code, 'price')]
+                batch_prices = self.fetch_batch_prices(uncached_codes) if uncached_codes else {}
                 
                 futures = {}
                 for code in self.lof_codes:
                     future = self.data_fetch_executor.submit(
                         self.fetch_single_fund_data, 
-                        code
+                        code,
+                        batch_prices.get(code)
                     )
                     futures[future] = code
                 
@@ -815,6 +1267,8 @@ class LOFMonitorApp:
                 status_msg = f"✅ 数据获取完成 | 基金: {successful}/{len(self.lof_codes)}"
                 status_msg += f" | 价格: {price_success}/{len(self.lof_codes)}"
                 status_msg += f" | 净值: {nav_success}/{len(self.lof_codes)}"
+                if uncached_codes:
+                    status_msg += f" | 批量行情: {len(batch_prices)}/{len(uncached_codes)}"
                 
                 if high_premium_count > 0:
                     status_msg += f" | 高溢价(>{alert_threshold}%): {high_premium_count}个"
@@ -981,27 +1435,50 @@ class LOFMonitorApp:
     
     def show_data_source_status(self):
         """显示数据源状态"""
-        cache_info = f"缓存数据: {len(self.data_cache)} 个基金"
-        
-        # 统计当前数据获取情况
-        price_sources = [name for _, name, _ in self.data_sources['price']]
-        nav_sources = [name for _, name, _ in self.data_sources['nav']]
+        cache_info = (f"缓存数据: {self.cache.code_count()} 个基金, {len(self.cache.entries)}/{self.cache.max_entries} 条, "
+                      f"已淘汰{self.cache.evictions}条")
         
-        message = f"数据源优先级策略:\n\n"
-        message += f"价格获取优先级:\n"
-        for i, (_, name, _) in enumerate(self.data_sources['price'], 1):
-            message += f"  {i}. {name}\n"
-        
-        message += f"\n净值获取优先级:\n"
-        for i, (_, name, _) in enumerate(self.data_sources['nav'], 1):
-            message += f"  {i}. {name}\n"
+        # 当前实际请求顺序（按健康状态动态调整）和每个数据源的实时状态
+        message = f"数据源状态（按当前实际请求顺序，熔断的数据源排在最后）:\n"
+        for data_type, title in (('price', '价格'), ('nav', '净值')):
+            message += f"\n{title}数据源:\n"
+            ordered = self._ordered_sources(data_type)
+            skipped = [(source_id, source_name) for source_id, source_name, _ in self.data_sources[data_type]
+                       if (source_id, source_name) not in ordered and source_id in self.source_fetchers[data_type]]
+            for i, (source_id, source_name) in enumerate(ordered + skipped, 1):
+                message += f"  {i}. {source_name}: {self._source_health(data_type, source_id).describe()}\n"
         
         message += f"\n缓存策略:\n"
-        message += f"  • 价格缓存: {self.cache_expiry['price']}秒\n"
-        message += f"  • 净值缓存: {self.cache_expiry['nav']}秒\n"
-        message += f"  • 完整数据缓存: {self.cache_expiry['full']}秒\n"
+        for data_type, title in (('price', '价格缓存'), ('nav', '净值缓存'), ('full', '完整数据缓存')):
+            message += (f"  • {title}: {self.cache_expiry[data_type]}秒（过期后{self.cache_stale[data_type]}秒内可用旧数据）"
+                        f" | {self.cache.describe(data_type)}\n")
         message += f"\n{cache_info}"
         
+        with self.stats_lock:
+            source_stats = {source: dict(stats) for source, stats in self.source_stats.items()}
+        if source_stats:
+            message += f"\n\n数据源请求统计:\n"
+            for source, stats in source_stats.items():
+                average = stats['total_time'] / stats['requests'] * 1000
+                message += (f"  • {source}: {stats['requests']}次, 失败{stats['failures']}次, "
+                            f"平均{average:.0f}ms, 最近{stats['last_time'] * 1000:.0f}ms, "
+                            f"最慢{stats['max_time'] * 1000:.0f}ms\n")
+        
+        if self.hedge_requests:
+            message += f"\n对冲请求: 开启（高优先级数据源{self.hedge_delay}秒或其近期耗时p95内未返回时并行请求下一个数据源）\n"
+            for data_type, source_id in list(self.source_latencies):
+                if len(self.source_latencies[(data_type, source_id)]) >= 10:
+                    delay = self._hedge_delay(data_type, source_id)
+                    message += f"  • {data_type}/{source_id}: 对冲延迟{delay * 1000:.0f}ms\n"
+        else:
+            message += f"\n对冲请求: 关闭（按优先级依次请求）\n"
+        
+        pool_stats = self._connection_pool_stats()
+        if pool_stats:
+            message += f"\n连接池（每个主机最多{self.hedge_workers}个长连接）:\n"
+            for host, connections, requests_sent in pool_stats:
+                message += f"  • {host}: 新建连接{connections}个, 请求{requests_sent}次\n"
+        
         messagebox.showinfo("数据源状态", message)
     
     def on_closing(self):
@@ -1009,6 +1486,8 @@ class LOFMonitorApp:
         self.stop_monitoring()
         if self.data_fetch_executor:
             self.data_fetch_executor.shutdown(wait=False)
+        self.hedge_executor.shutdown(wait=False)
+        self.session.close()
         self.root.destroy()
 
 def main():